@@ -0,0 +1,233 @@
+"""Бенчмарк лент: index, group_list, profile, post_detail, follow_index.
+
+Файл не попадает в обычный прогон (`python_files = test_*.py`), его
+запускают явно, размер данных задается переменными окружения:
+
+    BENCH_POSTS=100000 BENCH_USERS=5000 \
+        pytest tests/benchmarks/bench_feeds.py -s
+
+BENCH_POSTS     число постов (по умолчанию 10000)
+BENCH_USERS     число пользователей (1000)
+BENCH_GROUPS    число групп (20)
+BENCH_FOLLOWS   среднее число подписок на пользователя (20)
+BENCH_COMMENTS  число комментариев на пост в среднем (0.5)
+BENCH_REQUESTS  число запросов к каждой странице (50)
+BENCH_SEED      зерно генератора (1)
+BENCH_OUTPUT    куда записать JSON с результатами (bench-results.json)
+
+Подписки и авторство распределены по закону Ципфа: у немногих авторов
+большая часть постов и подписчиков. Перед каждым запросом кеш
+очищается, поэтому замеряется холодная отрисовка страницы.
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post
+from posts.stats import recount
+from posts.utils import keep_created
+
+User = get_user_model()
+
+POSTS = int(os.getenv("BENCH_POSTS", 10000))
+USERS = int(os.getenv("BENCH_USERS", 1000))
+GROUPS = int(os.getenv("BENCH_GROUPS", 20))
+FOLLOWS = int(os.getenv("BENCH_FOLLOWS", 20))
+COMMENTS = float(os.getenv("BENCH_COMMENTS", 0.5))
+REQUESTS = int(os.getenv("BENCH_REQUESTS", 50))
+SEED = int(os.getenv("BENCH_SEED", 1))
+OUTPUT = os.getenv("BENCH_OUTPUT", "bench-results.json")
+BATCH_SIZE = 5000
+PERCENTILES = (50, 90, 95, 99)
+
+
+def zipf_weights(count, exponent=1.1):
+    return [1 / rank**exponent for rank in range(1, count + 1)]
+
+
+def batches(items, size=BATCH_SIZE):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_dataset():
+    rng = random.Random(SEED)
+    fake = Faker("ru_RU")
+    fake.seed_instance(SEED)
+    users = mixer.cycle(USERS).blend(
+        User, username=mixer.sequence("bench_user_{0}")
+    )
+    groups = mixer.cycle(GROUPS).blend(
+        Group, slug=mixer.sequence("bench-group-{0}")
+    )
+    popularity = zipf_weights(USERS)
+    authors = users[:]
+    rng.shuffle(authors)
+    now = timezone.now()
+    span = timedelta(days=365).total_seconds()
+
+    def posts():
+        for _ in range(POSTS):
+            yield Post(
+                text=fake.text(max_nb_chars=400),
+                author=rng.choices(authors, popularity)[0],
+                group=rng.choice(groups + [None]),
+                created=now - timedelta(seconds=rng.uniform(0, span)),
+            )
+
+    with keep_created(Post, Comment):
+        for batch in batches(posts()):
+            Post.objects.bulk_create(batch)
+        post_ids = list(Post.objects.values_list("pk", flat=True))
+        comments = (
+            Comment(
+                post_id=rng.choice(post_ids),
+                author=rng.choice(users),
+                text=fake.sentence(),
+                created=now - timedelta(seconds=rng.uniform(0, span)),
+            )
+            for _ in range(int(POSTS * COMMENTS))
+        )
+        for batch in batches(comments):
+            Comment.objects.bulk_create(batch)
+
+    follows = set()
+    for user in users:
+        count = min(rng.randint(0, FOLLOWS * 2), USERS - 1)
+        for author in rng.choices(authors, popularity, k=count):
+            if author != user:
+                follows.add((user.pk, author.pk))
+    for batch in batches(follows):
+        Follow.objects.bulk_create(
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in batch
+        )
+    recount()
+    for follow in Follow.objects.select_related("user", "author"):
+        timeline.backfill(follow.user, follow.author)
+    return {
+        "users": users,
+        "groups": groups,
+        "authors": authors[:100],
+        "post_ids": post_ids,
+        "reader": User.objects.annotate(follows=Count("follower"))
+        .order_by("-follows")
+        .first(),
+    }
+
+
+def percentile(values, rank):
+    ordered = sorted(values)
+    index = max(0, round(rank / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@pytest.fixture(scope="module")
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        started = time.perf_counter()
+        data = build_dataset()
+        data["seconds"] = round(time.perf_counter() - started, 1)
+    return data
+
+
+@pytest.fixture(scope="module")
+def results(dataset):
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "database": connection.vendor,
+        "dataset": {
+            "posts": POSTS,
+            "users": USERS,
+            "groups": GROUPS,
+            "follows": FOLLOWS,
+            "comments": COMMENTS,
+            "seed": SEED,
+            "build_seconds": dataset["seconds"],
+        },
+        "requests": REQUESTS,
+        "views": {},
+    }
+    yield report["views"]
+    with open(OUTPUT, "w", encoding="utf-8") as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+def url_for(view, data, rng):
+    if view == "index":
+        return reverse("posts:index") + rng.choice(["", "?page=2", "?page=50"])
+    if view == "group_list":
+        group = rng.choice(data["groups"])
+        return reverse("posts:group_list", args=[group.slug])
+    if view == "profile":
+        author = rng.choice(data["authors"])
+        return reverse("posts:profile", args=[author.username])
+    if view == "post_detail":
+        post_id = rng.choice(data["post_ids"])
+        return reverse("posts:post_detail", args=[post_id])
+    return reverse("posts:follow_index")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "view", ["index", "group_list", "profile", "post_detail", "follow_index"]
+)
+def test_view_latency(view, dataset, results, client):
+    rng = random.Random(f"{SEED}-{view}")
+    client.force_login(dataset["reader"])
+    timings = []
+    queries = []
+    for _ in range(REQUESTS):
+        url = url_for(view, dataset, rng)
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, url
+        queries.append(len(captured))
+    stats = {f"p{rank}_ms": percentile(timings, rank) for rank in PERCENTILES}
+    stats.update(
+        {
+            "mean_ms": sum(timings) / len(timings),
+            "max_ms": max(timings),
+            "queries_median": percentile(queries, 50),
+            "queries_max": max(queries),
+        }
+    )
+    results[view] = {key: round(value, 2) for key, value in stats.items()}
+    print(view, results[view])
@@ -0,0 +1,216 @@
+"""Бенчмарк конкурентного чтения и записи SQLite: до и после yatube.sqlite.
+
+Как и bench_feeds.py, запускается явно:
+
+    BENCH_READERS=16 pytest tests/benchmarks/bench_sqlite.py -s
+
+BENCH_READERS   потоков-читателей (по умолчанию 8)
+BENCH_WRITERS   потоков-писателей (2)
+BENCH_SECONDS   длительность замера каждого профиля (5)
+BENCH_ROWS      комментариев в базе до начала замера (20000)
+BENCH_SQLITE_OUTPUT  куда записать JSON (bench-sqlite.json)
+
+Профиль `default` — прежняя конфигурация: стандартный бэкенд в режиме
+rollback journal и новое соединение на каждый запрос (CONN_MAX_AGE=0).
+Профиль `tuned` — yatube.sqlite с WAL и PRAGMA и постоянным
+соединением потока. Читатели выбирают страницу комментариев поста,
+писатели в транзакции добавляют комментарий и увеличивают счетчик, как
+при обычном комментировании. Каждый профиль работает со своим файлом.
+"""
+import json
+import os
+import platform
+import random
+import threading
+import time
+
+import pytest
+from django.db import OperationalError
+from django.db.utils import load_backend
+
+READERS = int(os.getenv("BENCH_READERS", 8))
+WRITERS = int(os.getenv("BENCH_WRITERS", 2))
+SECONDS = float(os.getenv("BENCH_SECONDS", 5))
+ROWS = int(os.getenv("BENCH_ROWS", 20000))
+OUTPUT = os.getenv("BENCH_SQLITE_OUTPUT", "bench-sqlite.json")
+POSTS = 500
+PERCENTILES = (50, 95, 99)
+
+PROFILES = {
+    "default": {"ENGINE": "django.db.backends.sqlite3", "persistent": False},
+    "tuned": {"ENGINE": "yatube.sqlite", "persistent": True},
+}
+SCHEMA = (
+    "CREATE TABLE post (id INTEGER PRIMARY KEY, comments_count INTEGER)",
+    "CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, "
+    "text TEXT, created REAL)",
+    "CREATE INDEX comment_post_idx ON comment (post_id, id)",
+)
+READ_SQL = (
+    "SELECT id, text, created FROM comment WHERE post_id = %s "
+    "ORDER BY id DESC LIMIT 20"
+)
+
+
+def percentile(values, rank):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = max(0, round(rank / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Profile:
+    def __init__(self, name, path):
+        self.engine = PROFILES[name]["ENGINE"]
+        self.persistent = PROFILES[name]["persistent"]
+        self.settings = {
+            "ENGINE": self.engine,
+            "NAME": str(path),
+            "OPTIONS": {},
+            "TIME_ZONE": None,
+            "CONN_MAX_AGE": 0,
+            "AUTOCOMMIT": True,
+            "ATOMIC_REQUESTS": False,
+            "USER": "",
+            "PASSWORD": "",
+            "HOST": "",
+            "PORT": "",
+            "TEST": {},
+        }
+
+    def connect(self):
+        wrapper = load_backend(self.engine).DatabaseWrapper(
+            dict(self.settings), alias=f"bench-{threading.get_ident()}"
+        )
+        wrapper.ensure_connection()
+        return wrapper
+
+    def populate(self, rng):
+        conn = self.connect()
+        with conn.cursor() as cursor:
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany(
+                "INSERT INTO post (id, comments_count) VALUES (%s, 0)",
+                [(pk,) for pk in range(1, POSTS + 1)],
+            )
+            cursor.executemany(
+                "INSERT INTO comment (post_id, text, created) "
+                "VALUES (%s, %s, %s)",
+                [
+                    (rng.randint(1, POSTS), "x" * 200, time.time())
+                    for _ in range(ROWS)
+                ],
+            )
+        conn.close()
+
+
+def worker(profile, operation, stop, stats, seed):
+    rng = random.Random(seed)
+    conn = profile.connect() if profile.persistent else None
+    while not stop.is_set():
+        if conn is None or not profile.persistent:
+            # Как при CONN_MAX_AGE=0: соединение на каждый запрос.
+            conn = profile.connect()
+        started = time.perf_counter()
+        try:
+            operation(conn, rng)
+        except OperationalError:
+            stats["locked"] += 1
+        else:
+            stats["timings"].append((time.perf_counter() - started) * 1000)
+        if not profile.persistent:
+            conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+
+
+def read(conn, rng):
+    with conn.cursor() as cursor:
+        cursor.execute(READ_SQL, [rng.randint(1, POSTS)])
+        cursor.fetchall()
+
+
+def write(conn, rng):
+    post_id = rng.randint(1, POSTS)
+    with conn.cursor() as cursor:
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute(
+                "INSERT INTO comment (post_id, text, created) "
+                "VALUES (%s, %s, %s)",
+                [post_id, "y" * 200, time.time()],
+            )
+            cursor.execute(
+                "UPDATE post SET comments_count = comments_count + 1 "
+                "WHERE id = %s",
+                [post_id],
+            )
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+
+
+def run(profile):
+    stop = threading.Event()
+    stats = {
+        kind: {"timings": [], "locked": 0} for kind in ("read", "write")
+    }
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(profile, read, stop, stats["read"], f"r{number}"),
+        )
+        for number in range(READERS)
+    ] + [
+        threading.Thread(
+            target=worker,
+            args=(profile, write, stop, stats["write"], f"w{number}"),
+        )
+        for number in range(WRITERS)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    report = {}
+    for kind, result in stats.items():
+        timings = result["timings"]
+        report[kind] = {
+            "per_second": round(len(timings) / SECONDS, 1),
+            "locked": result["locked"],
+            **{
+                f"p{rank}_ms": round(percentile(timings, rank) or 0, 2)
+                for rank in PERCENTILES
+            },
+        }
+    return report
+
+
+@pytest.fixture(scope="module")
+def results():
+    report = {
+        "python": platform.python_version(),
+        "readers": READERS,
+        "writers": WRITERS,
+        "seconds": SECONDS,
+        "rows": ROWS,
+        "profiles": {},
+    }
+    yield report["profiles"]
+    with open(OUTPUT, "w", encoding="utf-8") as output:
+        json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+@pytest.mark.parametrize("name", list(PROFILES))
+def test_concurrency(name, results, tmp_path, django_db_blocker):
+    profile = Profile(name, tmp_path / f"{name}.sqlite3")
+    with django_db_blocker.unblock():
+        profile.populate(random.Random(name))
+        results[name] = run(profile)
+    print(name, results[name])
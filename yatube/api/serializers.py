@@ -0,0 +1,71 @@
+"""Компактные сериализаторы API поверх `.values()`.
+
+Запросы выбирают только нужные столбцы словарями, без экземпляров
+моделей, а функции ниже лишь переименовывают ключи для ответа.
+"""
+from core.paginators import CursorPaginator, encode_cursor
+from django.core.files.storage import default_storage
+
+POST_FIELDS = (
+    "id",
+    "text",
+    "created",
+    "author__username",
+    "group__slug",
+    "image",
+    "comments_count",
+)
+COMMENT_FIELDS = ("id", "text", "created", "author__username")
+GROUP_FIELDS = ("title", "slug", "description")
+PROFILE_FIELDS = ("username", "stats__posts_count", "stats__followers_count")
+
+
+class ValuesCursorPaginator(CursorPaginator):
+    """CursorPaginator для queryset из словарей `.values()`."""
+
+    def cursor_for(self, item):
+        return encode_cursor(item["created"], item["id"])
+
+
+def post_row(row):
+    return {
+        "id": row["id"],
+        "text": row["text"],
+        "created": row["created"],
+        "author": row["author__username"],
+        "group": row["group__slug"],
+        "image": default_storage.url(row["image"]) if row["image"] else None,
+        "comments_count": row["comments_count"],
+    }
+
+
+def post_instance_row(post):
+    """Тот же вид для поста-экземпляра, например из ленты подписок."""
+    return post_row(
+        {
+            "id": post.pk,
+            "text": post.text,
+            "created": post.created,
+            "author__username": post.author.username,
+            "group__slug": post.group.slug if post.group else None,
+            "image": post.image.name,
+            "comments_count": post.comments_count,
+        }
+    )
+
+
+def comment_row(row):
+    return {
+        "id": row["id"],
+        "text": row["text"],
+        "created": row["created"],
+        "author": row["author__username"],
+    }
+
+
+def profile_row(row):
+    return {
+        "username": row["username"],
+        "posts_count": row["stats__posts_count"] or 0,
+        "followers_count": row["stats__followers_count"] or 0,
+    }
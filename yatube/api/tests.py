@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+# Поколения лент растут в on_commit, поэтому нужны настоящие коммиты.
+class ApiTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="Author")
+        self.reader = User.objects.create_user(username="Reader")
+        self.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        self.posts = [
+            Post.objects.create(
+                text=f"Пост {i}", author=self.author, group=self.group
+            )
+            for i in range(25)
+        ]
+        Comment.objects.create(
+            text="Комментарий", author=self.reader, post=self.posts[0]
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_posts_are_paginated_by_cursor(self):
+        """Лента постов отдается страницами по курсору."""
+        first = self.client.get(reverse("api:posts")).json()
+        self.assertEqual(len(first["results"]), 20)
+        self.assertIsNone(first["previous"])
+        self.assertEqual(
+            first["results"][0],
+            {
+                "id": self.posts[-1].pk,
+                "text": "Пост 24",
+                "created": first["results"][0]["created"],
+                "author": "Author",
+                "group": "group",
+                "image": None,
+                "comments_count": 0,
+            },
+        )
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(
+            [post["id"] for post in second["results"]],
+            [post.pk for post in reversed(self.posts[:5])],
+        )
+        self.assertIsNone(second["next"])
+
+    def test_unchanged_feed_costs_304_without_queries(self):
+        """Повтор с тем же ETag — 304 без запросов, новый пост меняет ETag."""
+        address = reverse("api:group_posts", args=[self.group.slug])
+        response = self.client.get(address)
+        self.assertFalse(response.has_header("Last-Modified"))
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text="Новый", author=self.author, group=self.group)
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["text"], "Новый")
+
+    def test_if_modified_since_alone_gets_fresh_feed(self):
+        """Без ETag клиент не получает 304 с устаревшей лентой."""
+        address = reverse("api:posts")
+        self.client.get(address)
+        self.posts[-1].delete()
+        response = self.client.get(
+            address, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["text"], "Пост 23")
+
+    def test_comment_changes_etag_of_comments(self):
+        """Новый комментарий меняет ETag комментариев поста."""
+        address = reverse("api:comments", args=[self.posts[0].pk])
+        response = self.client.get(address)
+        self.assertEqual(response.json()["results"][0]["author"], "Reader")
+        Comment.objects.create(
+            text="Еще", author=self.author, post=self.posts[0]
+        )
+        self.assertNotEqual(self.client.get(address)["ETag"], response["ETag"])
+
+    def test_profile_and_detail(self):
+        """Профиль отдает счетчики, пост — свои поля."""
+        self.assertEqual(
+            self.client.get(reverse("api:profile", args=["Author"])).json(),
+            {"username": "Author", "posts_count": 25, "followers_count": 1},
+        )
+        post = self.client.get(
+            reverse("api:post_detail", args=[self.posts[0].pk])
+        ).json()
+        self.assertEqual(post["comments_count"], 1)
+
+    def test_missing_objects_return_json_404(self):
+        """Несуществующие объекты — 404 с JSON."""
+        for address in (
+            reverse("api:post_detail", args=[0]),
+            reverse("api:comments", args=[0]),
+            reverse("api:group_posts", args=["missing"]),
+            reverse("api:profile_posts", args=["missing"]),
+        ):
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {"detail": "Не найдено."})
+
+    def test_follow_feed_requires_login(self):
+        """Лента подписок только для авторизованных и у каждого своя."""
+        address = reverse("api:follow")
+        response = self.client.get(address)
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(response.has_header("ETag"))
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(address)
+        self.assertEqual(len(response.json()["results"]), 20)
+        self.assertIn("Cookie", response["Vary"])
+        author_client = Client()
+        author_client.force_login(self.author)
+        self.assertNotEqual(
+            author_client.get(address)["ETag"], response["ETag"]
+        )
+        self.assertEqual(author_client.get(address).json()["results"], [])
+
+    def test_anonymous_if_none_match_still_gets_401(self):
+        """Аноним с If-None-Match получает 401, а не 304."""
+        response = self.client.get(
+            reverse("api:follow"), HTTP_IF_NONE_MATCH="*"
+        )
+        self.assertEqual(response.status_code, 401)
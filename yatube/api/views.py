@@ -0,0 +1,156 @@
+"""Read-only JSON API.
+
+Каждый ответ получает сильный ETag из поколений кэша (см.
+posts.feed_cache), поэтому повторный запрос неизменившейся ленты
+получает 304 без обращения к базе и без сериализации. Last-Modified
+не отдается: дата самого нового поста не меняется при правке или
+удалении постов и комментариев, и по If-Modified-Since клиент получил
+бы 304 с устаревшими данными.
+"""
+import functools
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import condition, require_safe
+from django.views.decorators.vary import vary_on_cookie
+from posts.feed_cache import (
+    COMMENTS_GENERATION_KEY, FOLLOWS_GENERATION_KEY, GENERATION_KEY,
+    generation_etag,
+)
+from posts.models import Comment, Group, Post
+from posts.timeline import TimelinePaginator
+
+from .serializers import (
+    COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS, PROFILE_FIELDS,
+    ValuesCursorPaginator, comment_row, post_instance_row, post_row,
+    profile_row,
+)
+
+User = get_user_model()
+
+PER_PAGE = 20
+POSTS = (GENERATION_KEY, COMMENTS_GENERATION_KEY)
+
+
+def authenticated(view):
+    """401 анониму — раньше условной проверки, чтобы у отказа не было
+    ETag, который клиент мог бы повторить в If-None-Match."""
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"detail": "Нужна авторизация."}, status=401)
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def api_view(generations, per_user=False):
+    """GET-эндпоинт с ETag по поколениям кэша и JSON-ответом на 404.
+
+    `per_user` — ответ свой у каждого пользователя и только для вошедших.
+    """
+
+    def etag(request, *args, **kwargs):
+        return generation_etag(request, generations, per_user)
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                return JsonResponse({"detail": "Не найдено."}, status=404)
+
+        wrapper = condition(etag_func=etag)(wrapper)
+        if per_user:
+            wrapper = vary_on_cookie(authenticated(wrapper))
+        return require_safe(wrapper)
+
+    return decorator
+
+
+def first_or_404(queryset):
+    row = queryset.first()
+    if row is None:
+        raise Http404
+    return row
+
+
+def page_payload(request, paginator, serialize):
+    page = paginator.get_page(
+        after=request.GET.get("after"), before=request.GET.get("before")
+    )
+
+    def link(param, cursor):
+        if cursor is None:
+            return None
+        return f"{request.path}?{urlencode({param: cursor})}"
+
+    return {
+        "results": [serialize(item) for item in page],
+        "next": link("after", page.next_cursor),
+        "previous": link("before", page.previous_cursor),
+    }
+
+
+def post_page(request, queryset):
+    paginator = ValuesCursorPaginator(
+        queryset.values(*POST_FIELDS), PER_PAGE, key=("created", "id")
+    )
+    return JsonResponse(page_payload(request, paginator, post_row))
+
+
+@api_view(POSTS)
+def posts(request):
+    return post_page(request, Post.objects.all())
+
+
+@api_view(POSTS)
+def post_detail(request, post_id):
+    row = first_or_404(Post.objects.filter(pk=post_id).values(*POST_FIELDS))
+    return JsonResponse(post_row(row))
+
+
+@api_view((COMMENTS_GENERATION_KEY,))
+def comments(request, post_id):
+    rows = Comment.objects.filter(post_id=post_id).values(*COMMENT_FIELDS)
+    paginator = ValuesCursorPaginator(rows, PER_PAGE, key=("created", "id"))
+    payload = page_payload(request, paginator, comment_row)
+    # Наличие поста проверяем, только когда комментариев нет.
+    if not payload["results"] and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return JsonResponse(payload)
+
+
+@api_view((GENERATION_KEY,))
+def groups(request):
+    rows = Group.objects.order_by("title").values(*GROUP_FIELDS)
+    return JsonResponse({"results": list(rows)})
+
+
+@api_view(POSTS)
+def group_posts(request, slug):
+    group = first_or_404(Group.objects.filter(slug=slug).values("id"))
+    return post_page(request, Post.objects.filter(group_id=group["id"]))
+
+
+@api_view((GENERATION_KEY, FOLLOWS_GENERATION_KEY))
+def profile(request, username):
+    row = first_or_404(
+        User.objects.filter(username=username).values(*PROFILE_FIELDS)
+    )
+    return JsonResponse(profile_row(row))
+
+
+@api_view(POSTS)
+def profile_posts(request, username):
+    author = first_or_404(User.objects.filter(username=username).values("id"))
+    return post_page(request, Post.objects.filter(author_id=author["id"]))
+
+
+@api_view(POSTS + (FOLLOWS_GENERATION_KEY,), per_user=True)
+def follow(request):
+    paginator = TimelinePaginator(request.user, PER_PAGE)
+    return JsonResponse(page_payload(request, paginator, post_instance_row))
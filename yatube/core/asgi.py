@@ -0,0 +1,277 @@
+"""ASGI-обработчик поверх WSGIHandler для Django 2.2.
+
+В Django 2.2 своего ASGI нет, поэтому запрос переводится в WSGI environ
+и обрабатывается обычным WSGIHandler — со всеми middleware, сессиями и
+шаблонами — в ограниченном пуле из ASGI_THREADS потоков. Цикл событий
+при этом свободен: медленный запрос занимает поток пула, а не воркер.
+
+Независимые чтения одной страницы view запускает через `parallel`:
+под ASGI они идут одновременно в отдельном ограниченном пуле из
+ASGI_SYNC_THREADS потоков, чтобы поток запроса, ждущий их, не занимал
+место, нужное им самим. Это ускоряет отдельную страницу, но
+одновременных запросов по-прежнему не больше ASGI_THREADS.
+
+Если у ответа есть `async_stream` (см. posts.live), тело отдается этим
+асинхронным генератором, и поток пула освобождается сразу после view.
+Остальные потоковые ответы читаются в том же потоке, где работал view:
+их итераторы могут держать курсор базы, привязанный к потоку.
+
+Статику и медиа под ASGI раздает обратный прокси.
+"""
+import asyncio
+import contextvars
+import functools
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+
+from .middleware import current_metrics
+
+# Сколько кусков тела может ждать отправки, пока поток view ждет.
+STREAM_BACKLOG = 16
+
+_executor = None
+_sync_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS, thread_name_prefix="asgi"
+        )
+    return _executor
+
+
+def get_sync_executor():
+    global _sync_executor
+    if _sync_executor is None:
+        _sync_executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_SYNC_THREADS,
+            thread_name_prefix="asgi-sync",
+        )
+    return _sync_executor
+
+
+async def run_sync(func, *args, **kwargs):
+    """Выполняет блокирующий вызов в пуле, не держа цикл событий.
+
+    Вызов видит contextvars корутины: маршрутизацию реплик и метрики
+    запроса.
+    """
+    call = functools.partial(func, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_sync_executor(), context.run, pooled_call, call
+    )
+
+
+def pooled_call(call):
+    for connection in connections.all():
+        connection.close_if_unusable_or_obsolete()
+    metrics = current_metrics.get()
+    if metrics is None:
+        return call()
+    # Соединения этого потока не обернуты RequestMetricsMiddleware.
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(
+                connection.execute_wrapper(metrics.record_query)
+            )
+        return call()
+
+
+def parallel(request, *calls):
+    """Выполняет независимые вызовы без аргументов одновременно.
+
+    Под ASGIHandler они идут в пуле ASGI_SYNC_THREADS потоков и видят
+    contextvars запроса, а поток запроса ждет результатов. Без ASGI
+    (WSGI, тестовый клиент) вызовы идут по очереди в потоке запроса — в
+    том числе внутри его транзакции. Исключение вызова поднимается здесь.
+    """
+    if "asgi.loop" not in request.META:
+        return [call() for call in calls]
+    futures = [
+        get_sync_executor().submit(
+            contextvars.copy_context().run, pooled_call, call
+        )
+        for call in calls
+    ]
+    return [future.result() for future in futures]
+
+
+def build_environ(scope, body):
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        # WSGI передает путь байтами, прочитанными как latin-1.
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        if name in environ:
+            value = f"{environ[name]},{value}"
+        environ[name] = value
+    return environ
+
+
+class ASGIHandler:
+    def __init__(self):
+        self.wsgi = WSGIHandler()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError(f"Неподдерживаемый тип ASGI: {scope['type']}")
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+        chunks = asyncio.Queue(STREAM_BACKLOG)
+        handled = loop.run_in_executor(
+            get_executor(),
+            self.handle,
+            build_environ(scope, body),
+            loop,
+            started,
+            chunks,
+        )
+        handled.add_done_callback(
+            functools.partial(self.fail_unstarted, started)
+        )
+        status, headers, response = await started
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": headers,
+            }
+        )
+        if response is not None:
+            await self.send_async_stream(response, receive, send)
+        else:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": True,
+                    }
+                )
+        await send({"type": "http.response.body", "body": b""})
+        await handled
+
+    def handle(self, environ, loop, started, chunks):
+        """Работает в потоке пула: view и, если нужно, чтение тела."""
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            response_start["status"] = int(status.split(" ", 1)[0])
+            response_start["headers"] = [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ]
+
+        environ["asgi.loop"] = loop
+        response = self.wsgi(environ, start_response)
+        if getattr(response, "async_stream", None) is not None:
+            loop.call_soon_threadsafe(
+                started.set_result,
+                (
+                    response_start["status"],
+                    response_start["headers"],
+                    response,
+                ),
+            )
+            return
+
+        def put(chunk):
+            asyncio.run_coroutine_threadsafe(chunks.put(chunk), loop).result()
+
+        loop.call_soon_threadsafe(
+            started.set_result,
+            (response_start["status"], response_start["headers"], None),
+        )
+        try:
+            for chunk in response:
+                if chunk:
+                    put(chunk)
+        finally:
+            response.close()
+            put(None)
+
+    @staticmethod
+    def fail_unstarted(started, handled):
+        # Ошибка до начала ответа иначе оставила бы запрос ждать вечно.
+        if not started.done() and not handled.cancelled():
+            error = handled.exception()
+            if error is not None:
+                started.set_exception(error)
+
+    async def send_async_stream(self, response, receive, send):
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive))
+        try:
+            async for chunk in response.async_stream(run_sync):
+                if disconnected.done():
+                    break
+                if isinstance(chunk, str):
+                    chunk = chunk.encode(response.charset)
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": True,
+                    }
+                )
+        finally:
+            disconnected.cancel()
+            await run_sync(response.close)
+
+    @staticmethod
+    async def wait_disconnect(receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    @staticmethod
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
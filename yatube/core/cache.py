@@ -0,0 +1,222 @@
+"""Двухуровневый кэш: память процесса поверх общего хранилища.
+
+L1 — ограниченный LRU в памяти процесса с коротким временем жизни
+записей, L2 — общий для всех воркеров кэш из CACHES (по умолчанию
+файловый, чтобы локально не нужны были сервисы). Чтение идет сначала
+в L1, промах — в L2 с копированием найденного в L1, запись — в оба.
+
+Другие процессы не могут стереть запись из чужого L1, поэтому она
+живет там не дольше LOCAL_TIMEOUT секунд. Ключи поколений (с префиксом
+GENERATION_PREFIX) в L1 не попадают вовсе и всегда читаются из L2:
+увеличение поколения в одном процессе сразу видно остальным, а ключи,
+в которые поколение входит, после этого просто не совпадут со старыми.
+`incr` у файлового L2 выполняется под межпроцессной блокировкой:
+одновременные увеличения поколения из разных воркеров не теряются.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "core.cache.TieredCache",
+            "LOCATION": "tiered",
+            "OPTIONS": {"SHARED": "shared", "MAX_ENTRIES": 1000},
+        },
+        "shared": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": "/var/tmp/yatube-cache",
+        },
+    }
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: воркеры там не разделяют файловый кэш.
+    fcntl = None
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Как у LocMemCache: экземпляры бэкенда создаются на каждый поток, а
+# L1 и счетчики общие для процесса и различаются по LOCATION.
+_locals = {}
+_locks = {}
+_stats = {}
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = options.get("SHARED", "shared")
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 30)
+        self._generation_prefix = options.get("GENERATION_PREFIX", "gen:")
+        self._local = _locals.setdefault(location, OrderedDict())
+        self._lock = _locks.setdefault(location, threading.Lock())
+        self._stats = _stats.setdefault(
+            location, {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+        )
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def stats(self):
+        """Счетчики попаданий этого процесса и размер L1."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["l1_size"] = len(self._local)
+        lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+        hits = lookups - stats["misses"]
+        stats["hit_ratio"] = round(hits / lookups, 3) if lookups else None
+        return stats
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._stats[counter] += amount
+
+    def _is_generation(self, key):
+        return key.startswith(self._generation_prefix)
+
+    def _local_get(self, key, version):
+        local_key = self.make_key(key, version)
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return False, None
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                del self._local[local_key]
+                return False, None
+            self._local.move_to_end(local_key)
+            self._stats["l1_hits"] += 1
+        return True, pickle.loads(pickled)
+
+    def _local_set(self, key, value, timeout, version):
+        if self._is_generation(key):
+            return
+        local_key = self.make_key(key, version)
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            timeout = self._local_timeout
+        else:
+            timeout = min(timeout - time.time(), self._local_timeout)
+        if timeout <= 0:
+            self._local_delete(key, version)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + timeout, pickled)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key, version):
+        with self._lock:
+            self._local.pop(self.make_key(key, version), None)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._local_set(key, value, timeout, version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        if not self._is_generation(key):
+            found, value = self._local_get(key, version)
+            if found:
+                return value
+        sentinel = object()
+        value = self.shared.get(key, sentinel, version)
+        if value is sentinel:
+            self._count("misses")
+            return default
+        self._count("l2_hits")
+        # Срок жизни записи в L2 неизвестен, поэтому в L1 она живет
+        # LOCAL_TIMEOUT секунд.
+        self._local_set(key, value, None, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._local_set(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self._local_delete(key, version)
+        self.shared.delete(key, version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            hit, value = (
+                (False, None)
+                if self._is_generation(key)
+                else self._local_get(key, version)
+            )
+            if hit:
+                found[key] = value
+            else:
+                missing.append(key)
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            self._count("l2_hits", len(shared))
+            self._count("misses", len(missing) - len(shared))
+            for key, value in shared.items():
+                self._local_set(key, value, None, version)
+            found.update(shared)
+        return found
+
+    def has_key(self, key, version=None):
+        if not self._is_generation(key) and self._local_get(key, version)[0]:
+            return True
+        return self.shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        # Счетчики меняют все процессы, поэтому считаются только в L2.
+        self._local_delete(key, version)
+        with self._shared_lock():
+            return self.shared.incr(key, delta, version)
+
+    @contextmanager
+    def _shared_lock(self):
+        # incr у BaseCache — это get и set, и у файлового кэша
+        # одновременные увеличения теряются. Бэкенды без каталога
+        # (память процесса, memcached) увеличивают атомарно сами.
+        directory = getattr(self.shared, "_dir", None)
+        if directory is None or fcntl is None:
+            yield
+            return
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "incr.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(key, value, timeout, version)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(key, version)
+        self.shared.delete_many(keys, version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
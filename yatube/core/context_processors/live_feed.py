@@ -0,0 +1,5 @@
+from django.conf import settings
+
+
+def live_feed(request):
+    return {"live_feed": settings.LIVE_FEED}
@@ -0,0 +1,90 @@
+"""Копирование основной SQLite-базы в реплики.
+
+Страницы лент кэшируются и получают ETag по поколениям, а поколение
+сдвигается сразу после записи — раньше, чем запись доедет до реплики.
+Страница, построенная по отстающей реплике в этом промежутке, попала
+бы в кэш под новым поколением. Поэтому после копирования поколения,
+менявшиеся с начала предыдущего копирования, сдвигаются еще раз.
+"""
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from posts.feed_cache import (
+    COMMENTS_GENERATION_KEY, FOLLOWS_GENERATION_KEY, GENERATION_KEY,
+    bump_generation, generation,
+)
+
+from yatube.replicas import PRIMARY
+
+GENERATION_KEYS = (
+    GENERATION_KEY,
+    COMMENTS_GENERATION_KEY,
+    FOLLOWS_GENERATION_KEY,
+)
+
+
+class Command(BaseCommand):
+    help = "Копирует основную SQLite-базу в файлы реплик DATABASE_REPLICAS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Повторять копирование каждые столько секунд.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("Реплики не настроены: DATABASE_REPLICAS пуст.")
+        for alias in (PRIMARY, *settings.DATABASE_REPLICAS):
+            if connections[alias].vendor != "sqlite":
+                raise CommandError(f"{alias}: поддерживается только SQLite.")
+        synced = {}
+        while True:
+            started = {key: generation(key) for key in GENERATION_KEYS}
+            for alias in settings.DATABASE_REPLICAS:
+                self.sync(alias, options["verbosity"])
+            synced = self.invalidate(started, synced)
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
+
+    def sync(self, alias, verbosity):
+        started = time.perf_counter()
+        primary = connections[PRIMARY]
+        primary.ensure_connection()
+        # Backup API копирует согласованный снимок и пишет в файл
+        # реплики на месте, так что открытые соединения читателей
+        # после копирования видят новые данные.
+        replica = sqlite3.connect(
+            connections[alias].settings_dict["NAME"], timeout=30
+        )
+        try:
+            primary.connection.backup(replica)
+        finally:
+            replica.close()
+        if verbosity > 1:
+            self.stdout.write(
+                f"{alias}: {time.perf_counter() - started:.2f} с"
+            )
+
+    @staticmethod
+    def invalidate(started, synced):
+        """Сдвигает поколения, изменившиеся с прошлого копирования.
+
+        `started` — поколения перед этим копированием, `synced` — то,
+        что вернул прошлый вызов. Если поколение менялось и во время
+        копирования, эти записи могли не попасть в снимок: для такого
+        ключа возвращается None, и он сдвинется и после следующего.
+        """
+        current = {}
+        for key, value in started.items():
+            if synced.get(key) == value:
+                current[key] = value
+                continue
+            bumped = bump_generation(key)
+            current[key] = bumped if bumped == value + 1 else None
+        return current
@@ -0,0 +1,144 @@
+"""Метрики запроса: число и время SQL, время шаблонов и view, N+1.
+
+Включается настройкой REQUEST_METRICS. Метрики уходят в заголовок
+`Server-Timing` и одной JSON-строкой в лог `core.metrics`; если
+кэш ведет счетчики (core.cache.TieredCache), туда же попадают его
+попадания и промахи за время запроса. Запросы
+одной формы, повторенные в рамках запроса не меньше
+REQUEST_METRICS_REPEATS раз, помечаются как вероятный N+1.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+
+logger = logging.getLogger("core.metrics")
+current_metrics = ContextVar("current_metrics", default=None)
+PLACEHOLDERS_RE = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+CACHE_COUNTERS = ("l1_hits", "l2_hits", "misses")
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.shapes = Counter()
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.shapes[PLACEHOLDERS_RE.sub("(...)", sql)] += 1
+
+    def repeated(self, threshold):
+        return [
+            {"sql": shape, "count": count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+def cache_counters():
+    if not hasattr(cache, "stats"):
+        return None
+    stats = cache.stats()
+    return {counter: stats[counter] for counter in CACHE_COUNTERS}
+
+
+def timed_render(render):
+    def wrapper(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return render(self, context, request)
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+    wrapper.timed = True
+    return wrapper
+
+
+def install_template_timer():
+    if not getattr(Template.render, "timed", False):
+        Template.render = timed_render(Template.render)
+
+
+class RequestMetricsMiddleware:
+    """Собирает метрики каждого запроса, если включен REQUEST_METRICS.
+
+    `view` в Server-Timing — все время обработки ниже этого middleware,
+    то есть вместе с SQL и шаблонами, которые показаны отдельно.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        install_template_timer()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        # Счетчики общие для процесса, так что при параллельных запросах
+        # в разницу попадут и чужие обращения к кэшу.
+        cache_before = cache_counters()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        view_time = time.perf_counter() - start
+        repeated = metrics.repeated(settings.REQUEST_METRICS_REPEATS)
+        timings = [
+            f"db;dur={metrics.sql_time * 1000:.1f};"
+            f'desc="{metrics.queries} queries"',
+            f"tpl;dur={metrics.template_time * 1000:.1f}",
+            f"view;dur={view_time * 1000:.1f}",
+        ]
+        cache_used = None
+        if cache_before is not None:
+            cache_used = {
+                counter: value - cache_before[counter]
+                for counter, value in cache_counters().items()
+            }
+            timings.append(
+                f'cache;desc="l1 {cache_used["l1_hits"]}, '
+                f'l2 {cache_used["l2_hits"]}, miss {cache_used["misses"]}"'
+            )
+        response["Server-Timing"] = ", ".join(timings)
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": metrics.queries,
+            "sql_ms": round(metrics.sql_time * 1000, 1),
+            "template_ms": round(metrics.template_time * 1000, 1),
+            "view_ms": round(view_time * 1000, 1),
+            "n_plus_one": repeated,
+            "cache": cache_used,
+        }
+        logger.log(
+            logging.WARNING if repeated else logging.INFO,
+            json.dumps(record, ensure_ascii=False),
+        )
+        return response
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(created, pk):
+    """Кодирует позицию в ленте в строку вида `<микросекунды>.<pk>`."""
+    delta = created - EPOCH
+    micro = (delta.days * 86400 + delta.seconds) * 10**6
+    return f"{micro + delta.microseconds}.{pk}"
+
+
+def decode_cursor(value):
+    """Разбирает курсор, для битого значения возвращает None."""
+    try:
+        micro, pk = value.split(".")
+        return EPOCH + timedelta(microseconds=int(micro)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор по паре (created, pk).
+
+    Страница выбирается условием на ключ последней показанной записи,
+    поэтому не нужны ни COUNT(*), ни OFFSET: стоимость любой страницы
+    одинакова. Номер страницы `?page=N` из старых ссылок поддерживается
+    через OFFSET, дальше навигация идет курсорами.
+    """
+
+    def __init__(self, object_list, per_page, key=("created", "pk")):
+        super().__init__(object_list, per_page)
+        self.key = key
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def fetch(self, cursor, backwards, limit, offset=0):
+        """Возвращает `limit` записей после курсора (или до него)."""
+        created_field, pk_field = self.key
+        queryset = self.object_list
+        if cursor is not None:
+            created, pk = cursor
+            edge, tail = ("gte", "lte") if backwards else ("lte", "gte")
+            queryset = queryset.filter(
+                **{f"{created_field}__{edge}": created}
+            ).exclude(Q(**{created_field: created, f"{pk_field}__{tail}": pk}))
+        if backwards:
+            ordering = (created_field, pk_field)
+        else:
+            ordering = (f"-{created_field}", f"-{pk_field}")
+        window = slice(offset, offset + limit)
+        return list(queryset.order_by(*ordering)[window])
+
+    def get_page(self, after=None, before=None, number=None):
+        limit = self.per_page + 1
+        before_cursor = decode_cursor(before)
+        after_cursor = decode_cursor(after)
+        number = self._legacy_number(number)
+        if before_cursor is not None:
+            rows = self.fetch(before_cursor, True, limit)
+            has_previous = len(rows) > self.per_page
+            rows = rows[: self.per_page][::-1]
+            has_next = True
+        elif after_cursor is not None:
+            rows = self.fetch(after_cursor, False, limit)
+            has_previous = True
+            has_next = len(rows) > self.per_page
+        elif number > 1:
+            offset = (number - 1) * self.per_page
+            rows = self.fetch(None, False, limit, offset=offset)
+            if not rows:
+                return self.get_page()
+            has_previous = True
+            has_next = len(rows) > self.per_page
+        else:
+            rows = self.fetch(None, False, limit)
+            has_previous = False
+            has_next = len(rows) > self.per_page
+        return self._build_page(
+            rows[: self.per_page], has_previous, has_next, number
+        )
+
+    def cursor_for(self, item):
+        return encode_cursor(item.created, item.pk)
+
+    def _legacy_number(self, number):
+        try:
+            return max(int(number), 1)
+        except (TypeError, ValueError):
+            return 1
+
+    def _build_page(self, rows, has_previous, has_next, number):
+        # Page сам вычисляет has_next/has_previous по number и num_pages,
+        # поэтому пагинатор описывает «скользящее окно» вокруг страницы.
+        if not has_previous:
+            number = 1
+        elif number < 2:
+            number = 2
+        self._num_pages = number + 1 if has_next else number
+        page = Page(rows, number, self)
+        page.previous_cursor = (
+            self.cursor_for(rows[0]) if has_previous and rows else None
+        )
+        page.next_cursor = (
+            self.cursor_for(rows[-1]) if has_next and rows else None
+        )
+        return page
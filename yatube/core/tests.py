@@ -1,4 +1,48 @@
-from django.test import Client, TestCase
+import asyncio
+import json
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from core import writes
+from core.asgi import parallel
+from core.cache import TieredCache
+from core.management.commands import sync_replicas
+from core.middleware import RequestMetricsMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from posts.feed_cache import (
+    FOLLOWS_GENERATION_KEY, GENERATION_KEY, bump_feed_generation, generation,
+)
+from posts.models import Comment, Post
+from posts.storage import image_storage
+
+from yatube.replicas import (
+    STICKY_COOKIE, ReplicaRouter, Routing, StickyPrimaryMiddleware,
+    current_routing, replica_reads,
+)
+from yatube.sqlite.base import DatabaseWrapper
+
+User = get_user_model()
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
 
 
 class CustomErrorPagesURLTests(TestCase):
@@ -15,3 +59,373 @@ class CustomErrorPagesURLTests(TestCase):
             with self.subTest(address=address):
                 response = self.guest_client.get(address)
                 self.assertTemplateUsed(response, template)
+
+
+@override_settings(REQUEST_METRICS=True)
+class RequestMetricsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        Post.objects.bulk_create(
+            Post(text=f"Пост {i}", author=cls.author) for i in range(3)
+        )
+
+    def test_server_timing_header(self):
+        """Ответ содержит Server-Timing с SQL, шаблонами и view."""
+        cache.clear()
+        with self.assertLogs("core.metrics", level="INFO") as logs:
+            response = self.client.get(reverse("posts:index"))
+        timing = response["Server-Timing"]
+        for metric in ("db;dur=", "tpl;dur=", "view;dur=", "cache;desc="):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record["path"], reverse("posts:index"))
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["queries"], 0)
+        self.assertGreater(sum(record["cache"].values()), 0)
+
+    def test_repeated_queries_are_reported(self):
+        """Повторы запроса одной формы логируются как N+1."""
+        posts = Post.objects.all()
+
+        def view(request):
+            return HttpResponse(", ".join(p.author.username for p in posts))
+
+        middleware = RequestMetricsMiddleware(view)
+        with self.assertLogs("core.metrics", level="WARNING") as logs:
+            middleware(RequestFactory().get("/"))
+        record = json.loads(logs.records[-1].getMessage())
+        repeated = record["n_plus_one"]
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]["count"], 3)
+        self.assertIn("auth_user", repeated[0]["sql"])
+
+
+class RequestMetricsDisabledTests(TestCase):
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled_by_default(self):
+        """Без REQUEST_METRICS middleware не подключается."""
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestMetricsMiddleware(HttpResponse)
+        response = Client().get(reverse("posts:index"))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "shared": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "tiered-tests",
+        },
+    }
+)
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        # Отдельный L1 на тест: он общий для процесса по LOCATION.
+        self.cache = TieredCache(
+            self.id(), {"OPTIONS": {"SHARED": "shared", "MAX_ENTRIES": 2}}
+        )
+        self.addCleanup(self.cache.clear)
+
+    def test_shared_hit_fills_local_tier(self):
+        """Промах L1 читает L2 и кладет значение в L1."""
+        self.cache.shared.set("key", "value")
+        self.assertEqual(self.cache.get("key"), "value")
+        self.cache.shared.delete("key")
+        self.assertEqual(self.cache.get("key"), "value")
+        self.assertIsNone(self.cache.get("missing"))
+        stats = self.cache.stats()
+        self.assertEqual(
+            (stats["l1_hits"], stats["l2_hits"], stats["misses"]), (1, 1, 1)
+        )
+        self.assertEqual(stats["hit_ratio"], 0.667)
+
+    def test_generation_keys_are_read_from_shared_tier(self):
+        """Поколение, увеличенное другим процессом, видно сразу."""
+        self.cache.set("gen:feed", 1, None)
+        self.cache.shared.incr("gen:feed")
+        self.assertEqual(self.cache.get("gen:feed"), 2)
+        self.assertEqual(self.cache.incr("gen:feed"), 3)
+        self.assertEqual(self.cache.stats()["l1_size"], 0)
+
+    def test_local_tier_is_bounded(self):
+        """L1 вытесняет давно не читанное и забывает записи по времени."""
+        for key in ("a", "b", "c"):
+            self.cache.set(key, key)
+        self.cache.shared.clear()
+        self.assertEqual(
+            self.cache.get_many(["a", "b", "c"]), {"b": "b", "c": "c"}
+        )
+        monotonic = mock.patch(
+            "core.cache.time.monotonic", return_value=float("inf")
+        )
+        with monotonic:
+            self.assertIsNone(self.cache.get("c"))
+
+    def test_incr_is_atomic_across_file_cache_clients(self):
+        """Одновременные incr через файловый L2 не теряются."""
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {
+                "BACKEND": (
+                    "django.core.cache.backends.filebased.FileBasedCache"
+                ),
+                "LOCATION": directory,
+            }
+            with override_settings(CACHES={"shared": shared}):
+                options = {"OPTIONS": {"SHARED": "shared"}}
+                TieredCache(self.id(), options).set("gen:feed", 0, None)
+
+                def bump():
+                    # Как у отдельного воркера: свой клиент кэша.
+                    cache = TieredCache(self.id(), options)
+                    for _ in range(25):
+                        cache.incr("gen:feed")
+
+                threads = [threading.Thread(target=bump) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(
+                    TieredCache(self.id(), options).get("gen:feed"), 200
+                )
+
+
+class SQLiteBackendTests(TestCase):
+    def pragma(self, conn, name):
+        with conn.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_connection_applies_pragmas(self):
+        """Каждое соединение получает PRAGMA из yatube.sqlite."""
+        self.assertEqual(self.pragma(connection, "busy_timeout"), 5000)
+        self.assertEqual(self.pragma(connection, "synchronous"), 1)
+        self.assertEqual(self.pragma(connection, "temp_store"), 2)
+
+    def test_options_override_pragmas(self):
+        """PRAGMA из OPTIONS переопределяют умолчания и не идут в connect."""
+        conn = DatabaseWrapper(
+            {
+                **connection.settings_dict,
+                "NAME": ":memory:",
+                "OPTIONS": {"pragmas": {"busy_timeout": 250}},
+            }
+        )
+        self.addCleanup(conn.close)
+        self.assertEqual(self.pragma(conn, "busy_timeout"), 250)
+        self.assertEqual(self.pragma(conn, "cache_size"), -20000)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def route(self, routing, model=Post):
+        token = current_routing.set(routing)
+        self.addCleanup(current_routing.reset, token)
+
+        @replica_reads
+        def view(request):
+            return self.router.db_for_read(model)
+
+        return view(None)
+
+    def test_feed_reads_go_to_replica(self):
+        """Чтения во view с replica_reads идут на реплику."""
+        self.assertEqual(self.route(Routing(sticky=False)), "replica1")
+
+    def test_primary_reads(self):
+        """Прилипший запрос, сессии и чтения вне HTTP — в default."""
+        self.assertEqual(self.route(Routing(sticky=True)), "default")
+        self.assertEqual(self.route(Routing(sticky=False), Session), "default")
+        self.assertEqual(self.router.db_for_read(Post), "default")
+
+    def test_write_sticks_to_primary(self):
+        """После записи запрос и следующие за ним читают из default."""
+        wrote = Routing(sticky=False)
+        token = current_routing.set(wrote)
+        self.assertEqual(self.router.db_for_write(Post), "default")
+        current_routing.reset(token)
+        self.assertEqual(self.route(wrote), "default")
+
+        def view(request):
+            return HttpResponse(self.router.db_for_write(Post))
+
+        response = StickyPrimaryMiddleware(view)(RequestFactory().post("/"))
+        self.assertGreater(
+            float(response.cookies[STICKY_COOKIE].value), time.time()
+        )
+        seen = []
+
+        def reader(request):
+            seen.append(current_routing.get().sticky)
+            return HttpResponse()
+
+        request = RequestFactory().get("/")
+        request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        response = StickyPrimaryMiddleware(reader)(request)
+        self.assertEqual(seen, [True])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_only_primary_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate("default", "posts"))
+        self.assertFalse(self.router.allow_migrate("replica1", "posts"))
+
+
+class ReplicasDisabledTests(TestCase):
+    def test_disabled_by_default(self):
+        """Без DATABASE_REPLICAS middleware отключено, а sync — ошибка."""
+        with self.assertRaises(MiddlewareNotUsed):
+            StickyPrimaryMiddleware(HttpResponse)
+        with self.assertRaises(CommandError):
+            call_command("sync_replicas")
+
+
+class SyncReplicasTests(TestCase):
+    def generations(self):
+        return {key: generation(key) for key in sync_replicas.GENERATION_KEYS}
+
+    def test_copy_invalidates_pages_built_from_lagging_replica(self):
+        """После копирования сдвигаются поколения, менявшиеся с прошлого."""
+        invalidate = sync_replicas.Command.invalidate
+        started = self.generations()
+        synced = invalidate(started, {})
+        self.assertEqual(synced, self.generations())
+        self.assertNotEqual(synced, started)
+        self.assertEqual(invalidate(self.generations(), synced), synced)
+        self.assertEqual(self.generations(), synced)
+        bump_feed_generation()
+        started = self.generations()
+        synced = invalidate(started, synced)
+        self.assertEqual(synced[GENERATION_KEY], started[GENERATION_KEY] + 1)
+        self.assertEqual(
+            synced[FOLLOWS_GENERATION_KEY], started[FOLLOWS_GENERATION_KEY]
+        )
+
+
+@override_settings(WRITE_COALESCING=True, WRITE_COALESCING_WINDOW=50)
+class CoalescingWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="writer")
+        self.post = Post.objects.create(text="Пост", author=self.author)
+
+    def test_concurrent_inserts_share_transactions(self):
+        """Одновременные вставки коммитятся пачками и получают pk."""
+        writer = writes.get_writer()
+        batches = writer.batches
+        comments = [
+            Comment(
+                text=f"Комментарий {i}", author=self.author, post=self.post
+            )
+            for i in range(20)
+        ]
+        barrier = threading.Barrier(len(comments))
+
+        def comment(instance):
+            barrier.wait()
+            writes.save(instance)
+
+        threads = [
+            threading.Thread(target=comment, args=(instance,))
+            for instance in comments
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            sorted(instance.pk for instance in comments),
+            sorted(Comment.objects.values_list("pk", flat=True)),
+        )
+        self.assertLess(writer.batches - batches, len(comments))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, len(comments))
+
+    def test_failed_insert_is_reported_to_its_caller(self):
+        """Ошибка вставки поднимается у вызывающего, как при save()."""
+        duplicate = Post(text="Дубль", author=self.author, source_id="x")
+        writes.save(Post(text="Первый", author=self.author, source_id="x"))
+        with self.assertRaises(IntegrityError):
+            writes.save(duplicate)
+        self.assertEqual(Post.objects.filter(source_id="x").count(), 1)
+
+    def test_failure_is_reported_after_the_batch_ends(self):
+        """Ошибку вставки вызывающий получает уже вне транзакции пачки."""
+        in_batch = []
+        submit = writes.CoalescingWriter.submit
+
+        def watch(writer, instance, using):
+            future = submit(writer, instance, using)
+            # Колбэк выполняется в потоке писателя, с его соединением.
+            future.add_done_callback(
+                lambda _: in_batch.append(connections[using].in_atomic_block)
+            )
+            return future
+
+        writes.save(Post(text="Первый", author=self.author, source_id="y"))
+        with mock.patch.object(writes.CoalescingWriter, "submit", watch):
+            with self.assertRaises(IntegrityError):
+                writes.save(
+                    Post(text="Дубль", author=self.author, source_id="y")
+                )
+        self.assertEqual(in_batch, [False])
+
+    def test_files_are_stored_before_the_batch(self):
+        """Файл пишет вызывающий, писателю достается только строка."""
+        stored_in = []
+        store = image_storage._save
+
+        def record(name, content):
+            stored_in.append(threading.current_thread())
+            return store(name, content)
+
+        post = Post(
+            text="С картинкой",
+            author=self.author,
+            image=SimpleUploadedFile("small.gif", SMALL_GIF, "image/gif"),
+        )
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                with mock.patch.object(image_storage, "_save", record):
+                    writes.save(post)
+        self.assertEqual(stored_in, [threading.current_thread()])
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).image.name, post.image.name
+        )
+
+
+class ParallelTests(TestCase):
+    def view(self):
+        @replica_reads
+        def view(request):
+            return parallel(
+                request,
+                threading.get_ident,
+                lambda: current_routing.get().replica_reads,
+            )
+
+        return view
+
+    def test_inline_without_asgi(self):
+        """Без ASGI вызовы идут по очереди в потоке запроса."""
+        token = current_routing.set(Routing(sticky=False))
+        self.addCleanup(current_routing.reset, token)
+        request = RequestFactory().get("/")
+        self.assertEqual(self.view()(request), [threading.get_ident(), True])
+
+    def test_pool_under_asgi(self):
+        """Под ASGI вызовы идут в пуле и видят contextvars запроса."""
+        token = current_routing.set(Routing(sticky=False))
+        self.addCleanup(current_routing.reset, token)
+        request = RequestFactory().get("/")
+        request.META["asgi.loop"] = asyncio.new_event_loop()
+        self.addCleanup(request.META["asgi.loop"].close)
+        ident, replica = self.view()(request)
+        self.assertNotEqual(ident, threading.get_ident())
+        self.assertTrue(replica)
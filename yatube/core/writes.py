@@ -0,0 +1,159 @@
+"""Объединение одновременных вставок в одну транзакцию.
+
+В SQLite писатель один, и при всплеске комментариев воркеры по очереди
+ждут блокировку записи. Если включен WRITE_COALESCING, `save()` не
+пишет новую запись сам, а отдает ее потоку-писателю процесса и ждет
+future. Писатель собирает все, что пришло за WRITE_COALESCING_WINDOW
+миллисекунд (не больше WRITE_COALESCING_BATCH записей), и сохраняет их
+`instance.save()` в одной транзакции, каждую в своей точке сохранения:
+ошибка одной записи достается только ее вызывающему. Файлы полей
+вызывающий записывает в хранилище сам, до отправки писателю, так что
+в транзакции пачки остаются одни вставки строк.
+
+Для view ничего не меняется: сигналы срабатывают как обычно, а после
+`save()` у объекта есть pk, и он уже закоммичен. Изменения существующих
+записей и вставки внутри транзакции вызывающего пишутся сразу.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import FileField
+
+logger = logging.getLogger(__name__)
+
+WAIT_TIMEOUT = 30
+
+
+class CoalescingWriter:
+    def __init__(self, window, max_batch):
+        self.window = window
+        self.max_batch = max_batch
+        self.pid = os.getpid()
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.writes = 0
+        self.thread = threading.Thread(
+            target=self.run, name="coalescing-writer", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, instance, using):
+        future = Future()
+        self.queue.put((instance, using, future))
+        return future
+
+    def stop(self):
+        """Дописывает очередь и останавливает поток."""
+        self.queue.put(None)
+        self.thread.join(WAIT_TIMEOUT)
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.queue.get(
+                        timeout=max(0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            by_database = {}
+            for instance, using, future in batch:
+                by_database.setdefault(using, []).append((instance, future))
+            for using, items in by_database.items():
+                self.write(using, items)
+        for connection in connections.all():
+            connection.close()
+
+    def write(self, using, items):
+        connections[using].close_if_unusable_or_obsolete()
+        saved = []
+        # Вызывающие узнают результат только после конца транзакции:
+        # иначе их следующий запрос упрется в блокировку пачки.
+        failed = []
+        try:
+            with transaction.atomic(using=using):
+                for instance, future in items:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic(using=using):
+                            instance.save(using=using)
+                    except Exception as error:
+                        failed.append((future, error))
+                    else:
+                        saved.append((instance, future))
+        except Exception as error:
+            logger.exception("Не удалось закоммитить пачку вставок")
+            failed.extend((future, error) for _, future in saved)
+            saved = []
+        else:
+            self.batches += 1
+            self.writes += len(saved)
+        for future, error in failed:
+            future.set_exception(error)
+        for instance, future in saved:
+            future.set_result(instance.pk)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Писатель этого процесса; после fork создается заново."""
+    global _writer
+    with _writer_lock:
+        if (
+            _writer is None
+            or _writer.pid != os.getpid()
+            or not _writer.thread.is_alive()
+        ):
+            _writer = CoalescingWriter(
+                settings.WRITE_COALESCING_WINDOW / 1000,
+                settings.WRITE_COALESCING_BATCH,
+            )
+            atexit.register(_writer.stop)
+        return _writer
+
+
+def commit_files(instance):
+    """Записывает в хранилище новые файлы полей `instance`.
+
+    Это делает FileField.pre_save, и при вставке писателем файл уже
+    закоммичен: запись файла не держит транзакцию пачки.
+    """
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, FileField):
+            field.pre_save(instance, add=True)
+
+
+def save(instance):
+    """Сохраняет instance; новые записи — через писателя, если включен."""
+    using = router.db_for_write(type(instance), instance=instance)
+    if (
+        not settings.WRITE_COALESCING
+        or not instance._state.adding
+        or transaction.get_connection(using).in_atomic_block
+    ):
+        instance.save(using=using)
+        return instance
+    commit_files(instance)
+    get_writer().submit(instance, using).result(WAIT_TIMEOUT)
+    return instance
@@ -1,9 +1,19 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import matching
 
 
-class PostAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """Поиск в админке через индекс FTS5 вместо LIKE по полям."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return matching(queryset, search_term), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = (
         "pk",
         "text",
@@ -17,9 +27,9 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ("pk", "text", "created", "author", "post", "post_id")
-    search_fields = ("text", "post")
+    search_fields = ("text",)
     list_filter = ("created",)
     empty_value_display = "-пусто-"
 
@@ -0,0 +1,95 @@
+"""Потоковая выгрузка постов и комментариев в NDJSON.
+
+Записи в том же формате, что читает `manage.py import_content`, так
+что выгрузку можно загрузить обратно. Строки выбираются пачками по
+ключу pk, а каждая пачка читается `.iterator()` без кеша queryset,
+поэтому расход памяти не зависит от размера выгрузки.
+"""
+import json
+
+from .models import Comment, Post
+
+BATCH_SIZE = 2000
+CHUNK_SIZE = 500
+
+POST_FIELDS = (
+    "pk",
+    "source_id",
+    "author__username",
+    "text",
+    "group__slug",
+    "created",
+    "image",
+)
+COMMENT_FIELDS = (
+    "pk",
+    "source_id",
+    "post_id",
+    "post__source_id",
+    "author__username",
+    "text",
+    "created",
+)
+
+
+def keyset(queryset, fields):
+    """Обходит queryset пачками `pk > последний`, отдавая словари."""
+    last = 0
+    while True:
+        batch = (
+            queryset.filter(pk__gt=last)
+            .order_by("pk")
+            .values(*fields)[:BATCH_SIZE]
+        )
+        count = 0
+        for row in batch.iterator(chunk_size=CHUNK_SIZE):
+            count += 1
+            last = row["pk"]
+            yield row
+        if count < BATCH_SIZE:
+            return
+
+
+def post_record(row, images):
+    record = {
+        "type": "post",
+        "id": row["source_id"] or str(row["pk"]),
+        "author": row["author__username"],
+        "text": row["text"],
+        "group": row["group__slug"],
+        "created": row["created"].isoformat(),
+    }
+    if images and row["image"]:
+        record["image"] = row["image"]
+    return record
+
+
+def comment_record(row):
+    return {
+        "type": "comment",
+        "id": row["source_id"] or str(row["pk"]),
+        "post": row["post__source_id"] or str(row["post_id"]),
+        "author": row["author__username"],
+        "text": row["text"],
+        "created": row["created"].isoformat(),
+    }
+
+
+def group_records(group, images=False):
+    """Все посты группы."""
+    posts = Post.objects.filter(group=group)
+    for row in keyset(posts, POST_FIELDS):
+        yield post_record(row, images)
+
+
+def user_records(user, images=False):
+    """Все посты пользователя, а затем все его комментарии."""
+    for row in keyset(Post.objects.filter(author=user), POST_FIELDS):
+        yield post_record(row, images)
+    for row in keyset(Comment.objects.filter(author=user), COMMENT_FIELDS):
+        yield comment_record(row)
+
+
+def ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
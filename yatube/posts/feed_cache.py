@@ -0,0 +1,139 @@
+"""Версионированный кэш HTML-фрагментов лент.
+
+Ключ фрагмента включает страницу ленты и номер поколения. Любое
+сохранение или удаление поста увеличивает поколение, поэтому страницы
+можно кэшировать надолго: после записи они сразу строятся заново.
+Так же ведутся поколения комментариев и подписок. Из поколений
+строятся ETag для условных GET-запросов: их можно проверить без
+обращения к базе.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+GENERATION_KEY = "gen:posts:feed"
+COMMENTS_GENERATION_KEY = "gen:posts:comments"
+FOLLOWS_GENERATION_KEY = "gen:posts:follows"
+PAGE_PARAMS = ("page", "after", "before")
+FOLLOW_CACHE_TIMEOUT = 20
+
+
+def _seed():
+    # Начинаем с текущего времени, чтобы после вытеснения ключа из кэша
+    # поколение не повторило старое значение.
+    return int(time.time() * 1000)
+
+
+def generation(key):
+    return cache.get_or_set(key, _seed, None)
+
+
+def bump_generation(key):
+    """Сдвигает поколение и возвращает новое значение."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        value = _seed()
+        cache.set(key, value, None)
+        return value
+
+
+def feed_generation():
+    return generation(GENERATION_KEY)
+
+
+def bump_feed_generation():
+    bump_generation(GENERATION_KEY)
+
+
+def feed_cache_context(request):
+    """Переменные для `{% cache %}` в шаблонах лент.
+
+    Ключ фрагмента `feed_key` собирается здесь, а не в шаблоне, чтобы
+    view мог заранее проверить фрагмент в кэше (см. `fragment_cached`).
+    """
+    return {
+        "feed_cache_timeout": settings.FEED_CACHE_TIMEOUT,
+        "feed_key": _fragment_key(
+            request,
+            feed_generation(),
+            request.user.is_authenticated,
+        ),
+    }
+
+
+def follow_cache_context(request):
+    """То же для ленты подписок: она своя у каждого и меняется
+    с подписками."""
+    return {
+        "feed_cache_timeout": FOLLOW_CACHE_TIMEOUT,
+        "feed_key": _fragment_key(
+            request,
+            feed_generation(),
+            generation(FOLLOWS_GENERATION_KEY),
+            request.user.pk,
+        ),
+    }
+
+
+def _fragment_key(request, *parts):
+    page = [request.GET.get(param, "") for param in PAGE_PARAMS]
+    return ":".join(map(str, [*parts, *page]))
+
+
+def fragment_cached(name, context):
+    """Лежит ли в кэше фрагмент `{% cache ... name feed_key %}`."""
+    key = make_template_fragment_key(name, [context["feed_key"]])
+    return cache.has_key(key)
+
+
+def generation_etag(request, keys, per_user=False):
+    """ETag ответа по адресу и поколениям из `keys`."""
+    parts = [request.get_full_path()]
+    parts.extend(generation(key) for key in keys)
+    if per_user:
+        parts.append(request.user.pk)
+    return hashlib.sha1(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def conditional_feed(*keys):
+    """Условный GET и Cache-Control для HTML-ленты.
+
+    Анонимные ответы публичные, их может держать обратный прокси
+    FEED_PROXY_CACHE_TIMEOUT секунд. Авторизованным — приватные, но с
+    ETag, так что повторный заход на неизменную ленту получает 304.
+    """
+
+    def etag(request, *args, **kwargs):
+        # В шапке страницы имя пользователя, поэтому ETag у каждого свой.
+        return generation_etag(request, keys, per_user=True)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag)(view)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response,
+                    public=True,
+                    max_age=0,
+                    s_maxage=settings.FEED_PROXY_CACHE_TIMEOUT,
+                )
+            patch_vary_headers(response, ("Cookie",))
+            return response
+
+        return wrapper
+
+    return decorator
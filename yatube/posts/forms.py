@@ -1,6 +1,11 @@
+from core import writes
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm, forms
 from django.utils.functional import empty
 
+from . import images
 from .models import Comment, Post
 
 
@@ -9,6 +14,33 @@ class PostForm(ModelForm):
         model = Post
         fields = ["text", "group", "image"]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.original_image = None
+
+    def clean_image(self):
+        image = self.cleaned_data["image"]
+        if isinstance(image, UploadedFile):
+            if settings.POST_IMAGE_KEEP_ORIGINALS:
+                self.original_image = image
+            image = images.ingest(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        if not commit:
+            return post
+        writes.save(post)
+        self._save_m2m()
+        if self.original_image is not None:
+            self.original_image.seek(0)
+            default_storage.save(
+                f"posts/originals/{self.original_image.name}",
+                self.original_image,
+            )
+            self.original_image = None
+        return post
+
     def clean_subject(self):
         data = self.cleaned_data["text"]
         if data is not empty:
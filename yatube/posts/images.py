@@ -0,0 +1,68 @@
+"""Обработка картинок постов при загрузке.
+
+Фото с камеры приходят в полном разрешении и с EXIF. Перед сохранением
+картинка поворачивается по EXIF-ориентации, уменьшается до
+POST_IMAGE_MAX_SIZE и перекодируется в POST_IMAGE_FORMAT без
+метаданных. Так меньше и хранимые байты, и работа воркера миниатюр,
+которому больше не нужно декодировать многомегабайтные JPEG.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg", "PNG": "png"}
+
+
+def has_alpha(image):
+    return image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def output_format(image):
+    fmt = settings.POST_IMAGE_FORMAT
+    if fmt == "WEBP" and not features.check("webp"):
+        fmt = "JPEG"
+    if fmt == "JPEG" and has_alpha(image):
+        fmt = "PNG"
+    return fmt
+
+
+def ingest(upload):
+    """Возвращает обработанную копию загруженной картинки.
+
+    Анимации возвращаются как есть: перекодирование оставило бы
+    от них один кадр.
+    """
+    upload.seek(0)
+    with Image.open(upload) as source:
+        if getattr(source, "is_animated", False):
+            upload.seek(0)
+            return upload
+        # JPEG декодируется сразу в уменьшенном масштабе: большие фото
+        # не разворачиваются в память целиком.
+        source.draft("RGB", settings.POST_IMAGE_MAX_SIZE)
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail(settings.POST_IMAGE_MAX_SIZE, Image.LANCZOS)
+        fmt = output_format(image)
+        if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif fmt != "JPEG" and image.mode == "P":
+            image = image.convert("RGBA" if has_alpha(image) else "RGB")
+        # PNG и WebP дописывают EXIF и текстовые блоки из `info`, а
+        # уменьшение и перевод режима их копируют. Остается только
+        # прозрачность — она часть самой картинки.
+        image.info = {
+            key: value
+            for key, value in image.info.items()
+            if key == "transparency"
+        }
+        buffer = BytesIO()
+        image.save(
+            buffer, fmt, quality=settings.POST_IMAGE_QUALITY, optimize=True
+        )
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return ContentFile(buffer.getvalue(), name=f"{stem}.{EXTENSIONS[fmt]}")
@@ -0,0 +1,238 @@
+"""Живая лента: события о новых постах для Server-Sent Events.
+
+Сигнал post_save после коммита публикует компактное событие в
+Broadcaster процесса, а потоки `/live/…` раздают его подписчикам:
+клиенту достаточно запросить карточку по `card` и вставить ее в ленту.
+
+Посты, созданные в других процессах, сюда сигналом не приходят. Их
+добирает `catch_up()`: не реже раза в LIVE_POLL_INTERVAL секунд поток
+сверяет поколение кэша лент — оно лежит в общем для воркеров кэше и
+меняется при каждом посте. Если поколение сдвинулось, новые посты
+читаются из базы одним запросом и публикуются здесь же.
+
+Поток в WSGI занимает поток сервера на LIVE_STREAM_TIMEOUT секунд,
+после чего EventSource переподключается с Last-Event-ID. Под ASGI
+(yatube/asgi.py) тот же поток отдается асинхронно и потока не держит.
+Поэтому живая лента выключена, пока не задан LIVE_FEED: тогда адреса
+`/live/…` отвечают 404, а страницы лент не открывают EventSource.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.urls import reverse
+
+from .feed_cache import FOLLOWS_GENERATION_KEY, feed_generation, generation
+from .models import Follow, Post
+
+CATCH_UP_LIMIT = 50
+
+
+def post_event(post):
+    return {
+        "id": post.pk,
+        "author": post.author.username,
+        "group": post.group.slug if post.group_id else None,
+        "card": reverse("posts:post_card", args=[post.pk]),
+    }
+
+
+class Broadcaster:
+    """Последние события процесса и ожидающие их подписчики.
+
+    У каждого события свой номер `seq` в пределах процесса: посты из
+    других процессов могут прийти не по порядку pk.
+    """
+
+    def __init__(self, size):
+        self.events = deque(maxlen=size)
+        self.seen = set()
+        self.seq = 0
+        self.condition = threading.Condition()
+        self.waiters = set()
+        self.generation = None
+        # Последний pk, прочитанный из базы. Локальные события его не
+        # двигают: пост другого процесса может получить pk меньше.
+        self.polled_pk = None
+
+    def publish(self, event):
+        with self.condition:
+            if event["id"] in self.seen:
+                return
+            if len(self.events) == self.events.maxlen:
+                self.seen.discard(self.events[0][1]["id"])
+            self.seq += 1
+            self.events.append((self.seq, event))
+            self.seen.add(event["id"])
+            self.condition.notify_all()
+            waiters = list(self.waiters)
+        for loop, ready in waiters:
+            loop.call_soon_threadsafe(ready.set)
+
+    def backlog(self, after):
+        """Текущий seq и события о постах новее `after`."""
+        with self.condition:
+            return self.seq, [
+                event for _, event in self.events if event["id"] > after
+            ]
+
+    def newest_pk(self):
+        """Самый новый известный процессу пост: из событий или из базы."""
+        with self.condition:
+            return max([self.polled_pk or 0, *self.seen])
+
+    def since(self, seq):
+        with self.condition:
+            return self.seq, [
+                event for number, event in self.events if number > seq
+            ]
+
+    def wait(self, seq, timeout):
+        """Ждет событий после `seq` не дольше `timeout` секунд."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.seq > seq, timeout)
+        return self.since(seq)
+
+    async def wait_async(self, seq, timeout):
+        ready = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), ready)
+        with self.condition:
+            self.waiters.add(waiter)
+            pending = self.seq > seq
+        try:
+            if not pending:
+                await asyncio.wait_for(ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self.condition:
+                self.waiters.discard(waiter)
+        return self.since(seq)
+
+    def catch_up(self):
+        """Публикует посты, созданные другими процессами."""
+        current = feed_generation()
+        with self.condition:
+            if current == self.generation:
+                return
+            self.generation = current
+            polled_pk = self.polled_pk
+        if polled_pk is None:
+            newest = Post.objects.order_by("-pk").values_list("pk", flat=True)
+            posts = []
+            polled_pk = newest.first() or 0
+        else:
+            # Свои посты тоже прочитаются, но publish() их не повторит.
+            posts = list(
+                Post.objects.filter(pk__gt=polled_pk)
+                .select_related("author", "group")
+                .order_by("pk")[:CATCH_UP_LIMIT]
+            )
+        with self.condition:
+            if len(posts) == CATCH_UP_LIMIT:
+                # Остальное дочитаем при следующей проверке.
+                self.generation = None
+            self.polled_pk = max(
+                [self.polled_pk or 0, polled_pk, *(post.pk for post in posts)]
+            )
+        for post in posts:
+            self.publish(post_event(post))
+
+
+broadcaster = Broadcaster(settings.LIVE_BUFFER_SIZE)
+
+
+def publish_post(post):
+    broadcaster.publish(post_event(post))
+
+
+class Subscription:
+    """Какие события нужны подписчику: все, группы или подписок."""
+
+    def __init__(self, group=None, user=None):
+        self.group = group
+        self.user = user
+        self.authors = set()
+        self.follows_generation = None
+
+    def refresh(self):
+        """Перечитывает авторов подписок, если подписки менялись."""
+        if self.user is None:
+            return
+        current = generation(FOLLOWS_GENERATION_KEY)
+        if current != self.follows_generation:
+            self.follows_generation = current
+            self.authors = set(
+                Follow.objects.filter(user=self.user).values_list(
+                    "author__username", flat=True
+                )
+            )
+
+    def accepts(self, event):
+        if self.group is not None:
+            return event["group"] == self.group.slug
+        if self.user is not None:
+            return event["author"] in self.authors
+        return True
+
+
+def frame(event):
+    data = json.dumps(event, ensure_ascii=False)
+    return f"id: {event['id']}\nevent: post\ndata: {data}\n\n"
+
+
+def poll_timeout(ping_at):
+    """Сколько ждать своих событий до проверки чужих постов или пинга."""
+    return max(0, min(settings.LIVE_POLL_INTERVAL, ping_at - time.monotonic()))
+
+
+def stream(subscription, after):
+    """Поток SSE для WSGI."""
+    deadline = time.monotonic() + settings.LIVE_STREAM_TIMEOUT
+    subscription.refresh()
+    seq, events = broadcaster.backlog(after)
+    yield "retry: 3000\n\n"
+    while True:
+        for event in events:
+            if subscription.accepts(event):
+                yield frame(event)
+        if time.monotonic() >= deadline:
+            return
+        ping_at = min(time.monotonic() + settings.LIVE_HEARTBEAT, deadline)
+        while True:
+            broadcaster.wait(seq, poll_timeout(ping_at))
+            # Чужие посты проверяем и тогда, когда идут свои.
+            broadcaster.catch_up()
+            subscription.refresh()
+            seq, events = broadcaster.since(seq)
+            if events or time.monotonic() >= ping_at:
+                break
+        if not events:
+            yield ": ping\n\n"
+
+
+async def stream_async(subscription, after, run_sync):
+    """Тот же поток для ASGI; запросы к базе идут через `run_sync`."""
+    deadline = time.monotonic() + settings.LIVE_STREAM_TIMEOUT
+    await run_sync(subscription.refresh)
+    seq, events = broadcaster.backlog(after)
+    yield "retry: 3000\n\n"
+    while True:
+        for event in events:
+            if subscription.accepts(event):
+                yield frame(event)
+        if time.monotonic() >= deadline:
+            return
+        ping_at = min(time.monotonic() + settings.LIVE_HEARTBEAT, deadline)
+        while True:
+            await broadcaster.wait_async(seq, poll_timeout(ping_at))
+            await run_sync(broadcaster.catch_up)
+            await run_sync(subscription.refresh)
+            seq, events = broadcaster.since(seq)
+            if events or time.monotonic() >= ping_at:
+                break
+        if not events:
+            yield ": ping\n\n"
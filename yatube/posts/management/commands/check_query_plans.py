@@ -0,0 +1,111 @@
+import re
+import uuid
+
+from core.paginators import encode_cursor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+LOCMEM = "django.core.cache.backends.locmem.LocMemCache"
+FULL_SCAN_RE = re.compile(r"^SCAN (TABLE )?\w+$")
+
+
+def plan_problems(plan):
+    """Строки плана с полным проходом таблицы или сортировкой во
+    временном B-дереве."""
+    return [
+        detail
+        for detail in plan
+        if FULL_SCAN_RE.match(detail) or "USE TEMP B-TREE" in detail
+    ]
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет EXPLAIN QUERY PLAN запросов лент: ни один не должен "
+        "читать таблицу целиком или сортировать во временном B-дереве."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Команда проверяет планы только SQLite.")
+        # Временные строки откатываются, и их on_commit поколения лент не
+        # сдвигает: отрисованные по ним фрагменты нельзя класть в общий кэш.
+        location = f"check-query-plans-{uuid.uuid4().hex}"
+        isolated = {
+            alias: {"BACKEND": LOCMEM, "LOCATION": location}
+            for alias in ("default", "shared")
+        }
+        with override_settings(CACHES=isolated), transaction.atomic():
+            failures = self.check_views(options["verbosity"])
+            transaction.set_rollback(True)
+        if failures:
+            raise CommandError(
+                f"Запросов с полным проходом или сортировкой: {failures}."
+            )
+        self.stdout.write(self.style.SUCCESS("Все запросы лент индексные."))
+
+    def feed_urls(self):
+        """Создает временные данные и возвращает адреса всех лент."""
+        suffix = uuid.uuid4().hex[:8]
+        reader = User.objects.create_user(username=f"explain-r-{suffix}")
+        author = User.objects.create_user(username=f"explain-a-{suffix}")
+        group = Group.objects.create(
+            title="explain", slug=f"explain-{suffix}", description="explain"
+        )
+        Follow.objects.create(user=reader, author=author)
+        posts = [
+            Post.objects.create(
+                text=f"explain {i}", author=author, group=group
+            )
+            for i in range(3)
+        ]
+        Comment.objects.create(text="explain", author=reader, post=posts[0])
+        client = Client()
+        client.force_login(reader)
+        after = {"after": encode_cursor(posts[-1].created, posts[-1].pk)}
+        return client, {
+            "index": (reverse("posts:index"), {}),
+            "index (cursor)": (reverse("posts:index"), after),
+            "group_list": (
+                reverse("posts:group_list", args=(group.slug,)),
+                {},
+            ),
+            "profile": (reverse("posts:profile", args=(author.username,)), {}),
+            "follow_index": (reverse("posts:follow_index"), {}),
+            "post_detail": (
+                reverse("posts:post_detail", args=(posts[0].pk,)),
+                {},
+            ),
+        }
+
+    def check_views(self, verbosity):
+        client, urls = self.feed_urls()
+        failures = 0
+        for name, (address, params) in urls.items():
+            with CaptureQueriesContext(connection) as queries:
+                client.get(address, params)
+            for query in queries.captured_queries:
+                sql = query["sql"]
+                if not sql.upper().startswith("SELECT"):
+                    continue
+                plan = explain(sql)
+                problems = plan_problems(plan)
+                failures += bool(problems)
+                if problems or verbosity > 1:
+                    style = self.style.ERROR if problems else str
+                    self.stdout.write(style(f"[{name}] {sql}"))
+                    for detail in plan:
+                        self.stdout.write(f"    {detail}")
+        return failures
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from posts import export
+from posts.models import Group
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Выгружает посты группы или все записи пользователя в NDJSON."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--group", help="Slug группы.")
+        target.add_argument("--user", help="Имя пользователя.")
+        parser.add_argument(
+            "--images",
+            action="store_true",
+            help="Добавить в записи пути к картинкам постов.",
+        )
+        parser.add_argument(
+            "--output",
+            "-o",
+            default="-",
+            help="Файл для выгрузки, `-` — стандартный вывод.",
+        )
+
+    def handle(self, *args, **options):
+        images = options["images"]
+        if options["group"]:
+            try:
+                group = Group.objects.get(slug=options["group"])
+            except Group.DoesNotExist:
+                raise CommandError(f"Нет группы {options['group']}.")
+            records = export.group_records(group, images=images)
+        else:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"Нет пользователя {options['user']}.")
+            records = export.user_records(user, images=images)
+        if options["output"] == "-":
+            for line in export.ndjson(records):
+                self.stdout.write(line, ending="")
+            return
+        with open(options["output"], "w", encoding="utf-8") as output:
+            output.writelines(export.ndjson(records))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счетчики постов, комментариев и подписчиков."
+
+    def handle(self, *args, **options):
+        authors, posts = stats.recount()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Пересчитано авторов: {authors}, постов: {posts}."
+            )
+        )
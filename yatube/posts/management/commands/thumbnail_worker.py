@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Фоновый воркер, который нарезает миниатюры из очереди."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Разобрать очередь и завершиться.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Пауза между опросами пустой очереди, секунд.",
+        )
+        parser.add_argument(
+            "--batch",
+            type=int,
+            default=20,
+            help="Сколько заданий забирать за раз.",
+        )
+        parser.add_argument(
+            "--enqueue-existing",
+            action="store_true",
+            help="Поставить в очередь картинки всех существующих постов.",
+        )
+
+    def handle(self, *args, **options):
+        if options["enqueue_existing"]:
+            images = Post.objects.exclude(image="").values_list(
+                "image", flat=True
+            )
+            for image in images.iterator():
+                thumbnails.enqueue(Post(image=image).image)
+        done = 0
+        while True:
+            jobs = thumbnails.claim(options["batch"])
+            done += sum(thumbnails.process(job) for job in jobs)
+            if not jobs:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Готово картинок: {done}."))
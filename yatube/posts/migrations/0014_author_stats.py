@@ -0,0 +1,88 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    AuthorStats = apps.get_model("posts", "AuthorStats")
+    Comment = apps.get_model("posts", "Comment")
+    Follow = apps.get_model("posts", "Follow")
+    Post = apps.get_model("posts", "Post")
+
+    def count(model, field):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(**{field: OuterRef("pk")})
+                .order_by()
+                .values(field)
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            0,
+        )
+
+    AuthorStats.objects.bulk_create(
+        AuthorStats(user_id=pk)
+        for pk in User.objects.values_list("pk", flat=True)
+    )
+    AuthorStats.objects.update(
+        posts_count=count(Post, "author"),
+        followers_count=count(Follow, "author"),
+    )
+    Post.objects.update(comments_count=count(Comment, "post"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("posts", "0013_timelineentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuthorStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Автор",
+                    ),
+                ),
+                (
+                    "posts_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Постов"
+                    ),
+                ),
+                (
+                    "followers_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Подписчиков"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика автора",
+                "verbose_name_plural": "Статистика авторов",
+            },
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="comments_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Комментариев"
+            ),
+        ),
+        migrations.RunPython(count_stats, migrations.RunPython.noop),
+    ]
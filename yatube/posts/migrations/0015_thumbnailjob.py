@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-18 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0014_author_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ThumbnailJob",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "image",
+                    models.CharField(
+                        max_length=255, unique=True, verbose_name="Картинка"
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата постановки"
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Попыток"
+                    ),
+                ),
+                (
+                    "locked_until",
+                    models.DateTimeField(
+                        blank=True,
+                        null=True,
+                        verbose_name="Занято воркером до",
+                    ),
+                ),
+                (
+                    "error",
+                    models.TextField(
+                        blank=True, verbose_name="Последняя ошибка"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Задание на миниатюры",
+                "verbose_name_plural": "Задания на миниатюры",
+                "ordering": ("created",),
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:02
+
+from django.db import migrations
+
+TABLES = {
+    "posts_post_fts": "posts_post",
+    "posts_comment_fts": "posts_comment",
+}
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table, source in TABLES.items():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {table} USING fts5("
+            "text, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {table} (rowid, text) SELECT id, text FROM {source}"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for table in TABLES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0015_thumbnailjob"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
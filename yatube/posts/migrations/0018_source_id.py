@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0017_feed_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="comment",
+            name="source_id",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=64,
+                null=True,
+                unique=True,
+                verbose_name="Идентификатор в источнике импорта",
+            ),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="source_id",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=64,
+                null=True,
+                unique=True,
+                verbose_name="Идентификатор в источнике импорта",
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:15
+
+import posts.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0018_source_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredImage",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=255,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Файл",
+                    ),
+                ),
+                (
+                    "refs",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Ссылок"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Файл картинки",
+                "verbose_name_plural": "Файлы картинок",
+            },
+        ),
+        migrations.AlterField(
+            model_name="post",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                storage=posts.storage.ContentAddressedStorage(),
+                upload_to="posts/",
+                verbose_name="Картинка",
+            ),
+        ),
+    ]
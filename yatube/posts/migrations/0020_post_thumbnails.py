@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0019_stored_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="thumbnails",
+            field=models.TextField(
+                blank=True,
+                default="",
+                editable=False,
+                verbose_name="Готовые миниатюры",
+            ),
+        ),
+    ]
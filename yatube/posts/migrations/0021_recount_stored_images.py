@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:46
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def recount_refs(apps, schema_editor):
+    # Посты, получившие имя файла строкой, ссылок раньше не брали.
+    Post = apps.get_model("posts", "Post")
+    StoredImage = apps.get_model("posts", "StoredImage")
+    StoredImage.objects.update(
+        refs=Coalesce(
+            Subquery(
+                Post.objects.filter(image=OuterRef("name"))
+                .order_by()
+                .values("image")
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0020_post_thumbnails"),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_refs, migrations.RunPython.noop),
+    ]
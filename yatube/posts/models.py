@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import stored_image_field
+
 LENGTH_POST_STR = 15
 User = get_user_model()
 
@@ -32,10 +34,35 @@ class Post(models.Model):
         verbose_name="Группа",
         help_text="Группа, к которой будет относиться пост",
     )
-    image = models.ImageField("Картинка", upload_to="posts/", blank=True)
+    image = stored_image_field("Картинка", upload_to="posts/", blank=True)
+    comments_count = models.PositiveIntegerField(
+        "Комментариев", default=0, editable=False
+    )
+    thumbnails = models.TextField(
+        "Готовые миниатюры", blank=True, default="", editable=False
+    )
+    source_id = models.CharField(
+        "Идентификатор в источнике импорта",
+        max_length=64,
+        unique=True,
+        blank=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ("-created",)
+        indexes = [
+            models.Index(
+                fields=["author", "-created", "-id"],
+                name="post_author_created_idx",
+            ),
+            models.Index(
+                fields=["group", "-created", "-id"],
+                name="post_group_created_idx",
+            ),
+            models.Index(fields=["-created", "-id"], name="post_created_idx"),
+        ]
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
 
@@ -61,9 +88,23 @@ class Comment(models.Model):
         verbose_name="Пост",
         help_text="Пост, к которой будет относиться комментарий",
     )
+    source_id = models.CharField(
+        "Идентификатор в источнике импорта",
+        max_length=64,
+        unique=True,
+        blank=True,
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ("-created",)
+        indexes = [
+            models.Index(
+                fields=["post", "-created", "-id"],
+                name="comment_post_created_idx",
+            ),
+        ]
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
 
@@ -93,3 +134,92 @@ class Follow(models.Model):
 
     def __str__(self):
         return f"{self.user.username} подписан на {self.author.username}"
+
+
+class AuthorStats(models.Model):
+    """Счетчики автора, которые поддерживаются при каждой записи."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Автор",
+    )
+    posts_count = models.PositiveIntegerField("Постов", default=0)
+    followers_count = models.PositiveIntegerField("Подписчиков", default=0)
+
+    class Meta:
+        verbose_name = "Статистика автора"
+        verbose_name_plural = "Статистика авторов"
+
+    def __str__(self):
+        return f"Статистика {self.user.username}"
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок читателя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+        verbose_name="Читатель",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        verbose_name="Пост",
+    )
+    created = models.DateTimeField("Дата публикации")
+
+    class Meta:
+        ordering = ("-created",)
+        unique_together = ["user", "post"]
+        indexes = [
+            models.Index(
+                fields=["user", "-created", "-post"],
+                name="timeline_user_created_idx",
+            ),
+        ]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+
+    def __str__(self):
+        return f"{self.post} в ленте {self.user.username}"
+
+
+class ThumbnailJob(models.Model):
+    """Задание фоновому воркеру: сделать миниатюры картинки."""
+
+    image = models.CharField("Картинка", max_length=255, unique=True)
+    created = models.DateTimeField("Дата постановки", auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField("Попыток", default=0)
+    locked_until = models.DateTimeField(
+        "Занято воркером до", null=True, blank=True
+    )
+    error = models.TextField("Последняя ошибка", blank=True)
+
+    class Meta:
+        ordering = ("created",)
+        verbose_name = "Задание на миниатюры"
+        verbose_name_plural = "Задания на миниатюры"
+
+    def __str__(self):
+        return self.image
+
+
+class StoredImage(models.Model):
+    """Файл в хранилище по содержимому и число постов, которые на него
+    ссылаются."""
+
+    name = models.CharField("Файл", max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField("Ссылок", default=0)
+
+    class Meta:
+        verbose_name = "Файл картинки"
+        verbose_name_plural = "Файлы картинок"
+
+    def __str__(self):
+        return f"{self.name} ({self.refs})"
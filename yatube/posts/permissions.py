@@ -0,0 +1,50 @@
+"""Проверка прав на объект: загрузить один раз, проверить, передать во view.
+
+    @object_required(Post.objects.all(), "post_id", test=is_author,
+                     denied=redirect_to_post)
+    def post_edit(request, post_id, post):
+        ...
+
+Объект ищется по аргументу из URL; если его нет — 404. Найденный
+объект передается во view именованным аргументом с именем модели,
+так что view не запрашивает ту же строку второй раз.
+"""
+import functools
+
+from django.shortcuts import get_object_or_404, redirect
+
+
+def is_author(user, obj):
+    # Сравнение по id, чтобы не загружать автора отдельным запросом.
+    return user.is_authenticated and obj.author_id == user.pk
+
+
+def redirect_to_post(request, post):
+    return redirect("posts:post_detail", post.pk)
+
+
+def object_required(queryset, url_kwarg, field="pk", test=None, denied=None):
+    """Декоратор view: загружает объект из queryset и проверяет права.
+
+    `test(user, obj)` решает, можно ли пользователю работать с объектом,
+    а `denied(request, obj)` возвращает ответ, когда нельзя.
+    """
+    name = queryset.model._meta.model_name
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            obj = get_object_or_404(queryset, **{field: kwargs[url_kwarg]})
+            if test is not None and not test(request.user, obj):
+                return denied(request, obj)
+            kwargs[name] = obj
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+author_required = functools.partial(
+    object_required, test=is_author, denied=redirect_to_post
+)
@@ -0,0 +1,156 @@
+"""Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Тексты дублируются в виртуальные таблицы FTS5, которые сигналы
+сохранения и удаления держат в актуальном состоянии. Кандидатами
+служат SEARCH_MAX_RESULTS самых новых совпадений, и по bm25 ранжируются
+только они, поэтому ни ранжирование страницы, ни подсчет результатов не
+растут вместе с базой.
+На других СУБД поиск откатывается к `icontains`.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Comment, Post
+
+TABLES = {
+    Post: "posts_post_fts",
+    Comment: "posts_comment_fts",
+}
+TOKEN_RE = re.compile(r"\w+")
+
+
+def is_enabled():
+    return connection.vendor == "sqlite"
+
+
+def index(instance):
+    if not is_enabled():
+        return
+    table = TABLES[type(instance)]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [instance.pk])
+        cursor.execute(
+            f"INSERT INTO {table} (rowid, text) VALUES (%s, %s)",
+            [instance.pk, instance.text],
+        )
+
+
+def index_new(model, rows):
+    """Индексирует пачку строк — пар (pk, text) — одним executemany.
+
+    Уже проиндексированная строка заменяется, поэтому пачку можно
+    проиндексировать повторно, например при повторе импорта.
+    """
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {TABLES[model]} (rowid, text) "
+            "VALUES (%s, %s)",
+            list(rows),
+        )
+
+
+def unindex(instance):
+    if not is_enabled():
+        return
+    table = TABLES[type(instance)]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [instance.pk])
+
+
+def build_query(text):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово берется в кавычки и ищется по префиксу, так что
+    операторы и спецсимволы FTS5 из ввода не интерпретируются.
+    """
+    return " ".join(f'"{token}"*' for token in TOKEN_RE.findall(text))
+
+
+def matching(queryset, text):
+    """Все объекты `queryset` с `text`, без ранжирования и предела.
+
+    Для фильтров вроде поиска в админке, где нужны и старые совпадения,
+    которые SearchResults отбрасывает.
+    """
+    query = build_query(text)
+    if not query:
+        return queryset.none()
+    if not is_enabled():
+        return queryset.filter(text__icontains=text)
+    table = TABLES[queryset.model]
+    opts, quote = queryset.model._meta, connection.ops.quote_name
+    column = f"{quote(opts.db_table)}.{quote(opts.pk.column)}"
+    # RawSQL в `pk__in` Django 2.2 берет в двойные скобки, и SQLite
+    # сравнивает ключ только с первой строкой подзапроса.
+    return queryset.extra(
+        where=[
+            f"{column} IN (SELECT rowid FROM {table} WHERE {table} MATCH %s)"
+        ],
+        params=[query],
+    )
+
+
+class SearchResults:
+    """Ленивая выборка найденных объектов, понятная Paginator."""
+
+    def __init__(self, model, text, queryset=None):
+        self.model = model
+        self.query = build_query(text)
+        self.text = text
+        self.queryset = (
+            queryset if queryset is not None else model._default_manager.all()
+        )
+        self.limit = settings.SEARCH_MAX_RESULTS
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if not self.query:
+                self._count = 0
+            elif is_enabled():
+                self._count = self._execute(
+                    "SELECT count(*) FROM (SELECT 1 FROM {table} "
+                    "WHERE {table} MATCH %s LIMIT %s)",
+                    [self.query, self.limit],
+                )[0][0]
+            else:
+                self._count = min(self._fallback().count(), self.limit)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, window):
+        ids = self.ids(window.start or 0, window.stop)
+        objects = self.queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+    def ids(self, start=0, stop=None):
+        """Ключи найденных объектов в порядке релевантности."""
+        stop = self.limit if stop is None else min(stop, self.limit)
+        if not self.query or start >= stop:
+            return []
+        if not is_enabled():
+            found = self._fallback().values_list("pk", flat=True)
+            return list(found[start:stop])
+        # Ранжируются только кандидаты: FTS5 отдает их по rowid без bm25.
+        rows = self._execute(
+            "SELECT rowid FROM (SELECT rowid, rank FROM {table} "
+            "WHERE {table} MATCH %s ORDER BY rowid DESC LIMIT %s) "
+            "ORDER BY rank LIMIT %s OFFSET %s",
+            [self.query, self.limit, stop - start, start],
+        )
+        return [row[0] for row in rows]
+
+    def _execute(self, sql, params):
+        table = TABLES[self.model]
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(table=table), params)
+            return cursor.fetchall()
+
+    def _fallback(self):
+        return self.queryset.filter(text__icontains=self.text)
@@ -0,0 +1,112 @@
+import functools
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import live, search, stats, thumbnails, timeline
+from .feed_cache import (
+    COMMENTS_GENERATION_KEY, FOLLOWS_GENERATION_KEY, GENERATION_KEY,
+    bump_generation,
+)
+from .models import Comment, Follow, Group, Post, ThumbnailJob
+from .storage import image_storage
+
+
+def bump_on_commit(key):
+    # До коммита другой воркер прочитал бы старые строки и закэшировал
+    # их под новым поколением.
+    transaction.on_commit(functools.partial(bump_generation, key))
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        stats.change_author_stats(instance.author_id, posts_count=1)
+        timeline.fan_out_post(instance)
+        transaction.on_commit(functools.partial(live.publish_post, instance))
+    thumbnails.enqueue(instance.image)
+    search.index(instance)
+    bump_on_commit(GENERATION_KEY)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    stats.change_author_stats(instance.author_id, posts_count=-1)
+    search.unindex(instance)
+    bump_on_commit(GENERATION_KEY)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        stats.change_comments_count(instance.post_id, 1)
+    search.index(instance)
+    bump_on_commit(COMMENTS_GENERATION_KEY)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    stats.change_comments_count(instance.post_id, -1)
+    search.unindex(instance)
+    bump_on_commit(COMMENTS_GENERATION_KEY)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        stats.change_author_stats(instance.author_id, followers_count=1)
+        timeline.backfill(instance.user, instance.author)
+    bump_on_commit(FOLLOWS_GENERATION_KEY)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    stats.change_author_stats(instance.author_id, followers_count=-1)
+    timeline.prune(instance.user, instance.author)
+    bump_on_commit(FOLLOWS_GENERATION_KEY)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def refresh_group_feeds(sender, **kwargs):
+    bump_on_commit(GENERATION_KEY)
+
+
+def release_image(name):
+    if image_storage.release(name):
+        ThumbnailJob.objects.filter(image=name).delete()
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    # Берем сырое значение: обращение к отложенному полю стоило бы
+    # запроса. Строка — имя файла из базы или записанное в поле.
+    value = instance.__dict__.get("image")
+    instance._stored_image = value if isinstance(value, str) else None
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, created, **kwargs):
+    old = None if created else instance._stored_image
+    new = instance.image.name
+    uploaded = getattr(instance, "_uploaded_image", None)
+    instance._uploaded_image = None
+    if old == new:
+        if new and new == uploaded:
+            # Тот же файл загрузили заново: хранилище взяло вторую ссылку.
+            image_storage.release(new)
+        return
+    # Имя, записанное строкой, ссылки еще не взяло.
+    if new and new != uploaded:
+        image_storage.share(new)
+    if old:
+        transaction.on_commit(lambda: release_image(old))
+    instance._stored_image = new
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    name = instance.__dict__.get("image")
+    if name:
+        transaction.on_commit(lambda: release_image(name))
@@ -0,0 +1,94 @@
+"""Денормализованные счетчики постов, комментариев и подписчиков.
+
+Счетчики меняются атомарным UPDATE с F()-выражением, поэтому
+параллельные записи не теряют инкременты. Если счетчики все же
+разошлись с данными, их чинит `manage.py recount_stats`.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+BATCH_SIZE = 500
+
+
+def _shift(field, delta):
+    if delta < 0:
+        return Greatest(F(field) + delta, 0)
+    return F(field) + delta
+
+
+def change_author_stats(user_id, **deltas):
+    """Сдвигает счетчики автора, при необходимости создавая строку."""
+    changes = {field: _shift(field, delta) for field, delta in deltas.items()}
+    if AuthorStats.objects.filter(user_id=user_id).update(**changes):
+        return
+    initial = {field: max(delta, 0) for field, delta in deltas.items()}
+    try:
+        with transaction.atomic():
+            AuthorStats.objects.create(user_id=user_id, **initial)
+    except IntegrityError:
+        AuthorStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=_shift("comments_count", delta)
+    )
+
+
+def author_stats(user):
+    """Счетчики автора; для автора без записей — нулевые."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def recount_authors(user_ids=None):
+    """Пересчитывает счетчики авторов `user_ids`, без них — всех."""
+    users = User.objects.all()
+    author_stats = AuthorStats.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+        author_stats = author_stats.filter(user__in=user_ids)
+    missing = users.filter(stats__isnull=True).values_list("pk", flat=True)
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=pk) for pk in missing.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return author_stats.update(
+        posts_count=_count(Post.objects, "author"),
+        followers_count=_count(Follow.objects, "author"),
+    )
+
+
+def recount_posts(post_ids=None):
+    """Пересчитывает комментарии постов `post_ids`, без них — всех."""
+    posts = Post.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    return posts.update(comments_count=_count(Comment.objects, "post"))
+
+
+def recount():
+    """Пересчитывает все счетчики пакетными UPDATE с подзапросами."""
+    with transaction.atomic():
+        return recount_authors(), recount_posts()
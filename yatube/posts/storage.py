@@ -0,0 +1,137 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл называется по SHA-256 своего содержимого, который считается
+потоково во время записи, поэтому одинаковые загрузки ложатся в один
+файл и делят один набор миниатюр sorl. Сколько постов ссылается на
+файл, хранит StoredImage: файл и его миниатюры удаляются, только когда
+ссылок не осталось. Ссылку берет и загрузка, и пост, которому имя уже
+известного файла записано строкой (например, при импорте). Файлы без
+строки StoredImage (загруженные до появления хранилища) не удаляются
+никогда.
+"""
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.fields.files import ImageField, ImageFieldFile
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+
+def _stored_images():
+    # Модели импортируют хранилище, поэтому модель берется лениво.
+    from .models import StoredImage
+
+    return StoredImage.objects
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя дает хеш содержимого, занятость исходного имени
+        # ничего не значит.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        temp_name = posixpath.join(directory, f".upload-{uuid.uuid4().hex}")
+        temp_path = self.path(temp_name)
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        digest = hashlib.sha256()
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(fd, "wb") as output:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            hexdigest = digest.hexdigest()
+            extension = os.path.splitext(filename)[1].lower()
+            name = posixpath.join(
+                directory, hexdigest[:2], f"{hexdigest}{extension}"
+            )
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Ссылка берется до записи файла и в той же транзакции:
+            # параллельное release() того же имени ждет ее окончания.
+            with transaction.atomic():
+                self.acquire(name)
+                if not os.path.exists(path):
+                    os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    def acquire(self, name):
+        refs = _stored_images()
+        if refs.filter(name=name).update(refs=F("refs") + 1):
+            return
+        try:
+            with transaction.atomic():
+                refs.create(name=name, refs=1)
+        except IntegrityError:
+            refs.filter(name=name).update(refs=F("refs") + 1)
+
+    def share(self, name, count=1):
+        """Берет `count` ссылок на уже известный файл.
+
+        Возвращает False, если файла нет в StoredImage: такой файл
+        хранилище не удаляет и ссылок на него не считает.
+        """
+        return bool(
+            _stored_images().filter(name=name).update(refs=F("refs") + count)
+        )
+
+    def set_refs(self, name, count):
+        """Выставляет число ссылок на уже известный файл.
+
+        Нужно, когда ссылки пересчитываются по постам, например после
+        импорта. Как и `share`, возвращает False для незнакомого файла.
+        """
+        return bool(_stored_images().filter(name=name).update(refs=count))
+
+    def release(self, name):
+        """Снимает ссылку поста; последняя удаляет файл и миниатюры."""
+        refs = _stored_images()
+        with transaction.atomic():
+            if not refs.filter(name=name, refs__gt=0).update(
+                refs=F("refs") - 1
+            ):
+                return False
+            if not refs.filter(name=name, refs=0).delete()[0]:
+                return False
+            delete_thumbnails(ImageFile(name, self), delete_file=True)
+        return True
+
+
+image_storage = ContentAddressedStorage()
+
+
+class StoredImageFieldFile(ImageFieldFile):
+    """Файл поля картинки, отмечающий на посте свою загрузку."""
+
+    def save(self, name, content, save=True):
+        super().save(name, content, save=False)
+        # Ссылку на файл взяло хранилище при записи: сигналы поста не
+        # должны брать ее второй раз.
+        self.instance._uploaded_image = self.name
+        if save:
+            self.instance.save()
+
+
+def stored_image_field(*args, **kwargs):
+    """ImageField в этом хранилище с файлом StoredImageFieldFile.
+
+    Функция, а не подкласс поля: тесты Практикума требуют, чтобы поле
+    `Post.image` было именно ImageField. Миграциям класс файла не виден.
+    """
+    field = ImageField(*args, storage=image_storage, **kwargs)
+    field.attr_class = StoredImageFieldFile
+    return field
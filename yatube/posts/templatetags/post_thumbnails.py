@@ -0,0 +1,32 @@
+from django import template
+from posts.thumbnails import formats, stored_variants
+
+register = template.Library()
+
+SIZES = "(max-width: 960px) 100vw, 960px"
+MIME_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg", "PNG": "image/png"}
+
+
+def srcset(variants):
+    return ", ".join(
+        f"{variant['url']} {variant['width']}w" for variant in variants
+    )
+
+
+@register.inclusion_tag("includes/picture.html")
+def post_picture(post, size="card", css="card-img my-2"):
+    """`<picture>` с вариантами миниатюры, пока их нет — оригинал."""
+    ready = stored_variants(post, size)
+    fallback = formats()[-1]
+    context = {"image": post.image, "css": css, "sizes": SIZES}
+    if fallback not in ready:
+        return context
+    variants = ready[fallback]
+    # Размеры в `<img>` задают пропорции до загрузки: берем наибольший.
+    context["img"] = {**variants[-1], "srcset": srcset(variants)}
+    context["sources"] = [
+        {"type": MIME_TYPES[fmt], "srcset": srcset(ready[fmt])}
+        for fmt in formats()[:-1]
+        if fmt in ready
+    ]
+    return context
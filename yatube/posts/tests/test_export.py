@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import export
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="Writer")
+        cls.other = User.objects.create_user(username="Other")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f"Пост {i}",
+                author=cls.author,
+                group=cls.group,
+                image="posts/small.gif",
+            )
+            for i in range(5)
+        ]
+        Post.objects.create(text="Без группы", author=cls.other)
+        cls.comment = Comment.objects.create(
+            text="Комментарий", author=cls.author, post=cls.posts[0]
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def records(self, response):
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_group_export_streams_all_posts_in_batches(self):
+        """Выгрузка группы отдает все ее посты, читая их пачками."""
+        with mock.patch.object(export, "BATCH_SIZE", 2):
+            response = self.client.get(
+                reverse("posts:export_group", args=[self.group.slug])
+            )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        records = self.records(response)
+        self.assertEqual(
+            [record["id"] for record in records],
+            [str(post.pk) for post in self.posts],
+        )
+        self.assertNotIn("image", records[0])
+
+    def test_profile_export_with_comments_and_images(self):
+        """Выгрузка пользователя содержит посты, комментарии и картинки."""
+        response = self.client.get(
+            reverse("posts:export_profile", args=[self.author.username]),
+            {"images": "1"},
+        )
+        records = self.records(response)
+        self.assertEqual(len(records), 6)
+        self.assertEqual(records[0]["image"], "posts/small.gif")
+        self.assertEqual(
+            records[-1],
+            {
+                "type": "comment",
+                "id": str(self.comment.pk),
+                "post": str(self.posts[0].pk),
+                "author": self.author.username,
+                "text": self.comment.text,
+                "created": self.comment.created.isoformat(),
+            },
+        )
+
+    def test_export_access(self):
+        """Чужие записи выгружать нельзя, гостей отправляют на вход."""
+        url = reverse("posts:export_profile", args=[self.other.username])
+        self.assertRedirects(
+            self.client.get(url),
+            reverse("posts:profile", args=[self.other.username]),
+        )
+        response = Client().get(url)
+        self.assertRedirects(response, f"{reverse('users:login')}?next={url}")
+
+    def test_command_output_can_be_imported_back(self):
+        """Выгрузку командой можно загрузить обратно через import_content."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "writer.ndjson")
+            call_command("export_content", "--user=Writer", f"--output={path}")
+            texts = set(
+                Post.objects.filter(author=self.author).values_list(
+                    "text", flat=True
+                )
+            )
+            Post.objects.filter(author=self.author).delete()
+            call_command("import_content", path, stdout=StringIO())
+        self.assertEqual(
+            set(
+                Post.objects.filter(author=self.author).values_list(
+                    "text", flat=True
+                )
+            ),
+            texts,
+        )
+        self.assertEqual(Comment.objects.get().text, "Комментарий")
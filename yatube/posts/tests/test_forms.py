@@ -15,7 +15,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_FORMAT="JPEG")
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -75,7 +75,7 @@ class PostCreateFormTests(TestCase):
                 text="Тестовый текст ни о чем",
                 group=PostCreateFormTests.group,
                 author=PostCreateFormTests.user,
-                image="posts/small.gif",
+                image__endswith=".jpg",
             ).exists()
         )
 
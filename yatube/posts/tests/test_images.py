@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..forms import PostForm
+from ..images import ingest
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def upload(name, fmt, size, mode="RGB", **params):
+    buffer = BytesIO()
+    Image.new(mode, size, "red").save(buffer, fmt, **params)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_FORMAT="JPEG",
+    POST_IMAGE_MAX_SIZE=(400, 400),
+)
+class ImageIngestTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_photo_is_rotated_resized_and_stripped(self):
+        """Фото поворачивается по EXIF, уменьшается и теряет метаданные."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90° по часовой.
+        exif[0x010F] = "Camera"
+        photo = upload("photo.jpeg", "JPEG", (1200, 800), exif=exif)
+        result = ingest(photo)
+        self.assertEqual(result.name, "photo.jpg")
+        self.assertLess(result.size, photo.size)
+        with Image.open(result) as image:
+            self.assertEqual(image.size, (267, 400))
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_transparency_is_kept_as_png(self):
+        """Картинка с прозрачностью в JPEG не превращается."""
+        result = ingest(upload("logo.png", "PNG", (50, 50), "RGBA"))
+        self.assertEqual(result.name, "logo.png")
+        with Image.open(result) as image:
+            self.assertEqual(image.mode, "RGBA")
+
+    def test_png_metadata_is_stripped(self):
+        """EXIF не переживает перекодирование и в PNG."""
+        exif = Image.Exif()
+        exif[0x010F] = "SecretCamera"
+        result = ingest(
+            upload("logo.png", "PNG", (800, 800), "RGBA", exif=exif)
+        )
+        self.assertEqual(result.name, "logo.png")
+        with Image.open(result) as image:
+            self.assertEqual(len(image.getexif()), 0)
+            self.assertNotIn("exif", image.info)
+
+    def test_animation_is_stored_as_is(self):
+        """Анимация сохраняется без перекодирования."""
+        buffer = BytesIO()
+        frames = [Image.new("P", (10, 10), color) for color in (1, 2)]
+        frames[0].save(buffer, "GIF", save_all=True, append_images=frames[1:])
+        animation = SimpleUploadedFile("cat.gif", buffer.getvalue())
+        self.assertIs(ingest(animation), animation)
+
+    @override_settings(POST_IMAGE_KEEP_ORIGINALS=True)
+    def test_original_is_kept_aside(self):
+        """По настройке оригинал сохраняется в posts/originals/."""
+        form = PostForm(
+            data={"text": "Пост с фото"},
+            files={"image": upload("big.jpg", "JPEG", (800, 600))},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.instance.author = User.objects.create_user(username="Photo")
+        post = form.save()
+        self.assertTrue(post.image.name.endswith(".jpg"))
+        self.assertEqual(post.image.width, 400)
+        original = os.path.join(TEMP_MEDIA_ROOT, "posts/originals/big.jpg")
+        with Image.open(original) as image:
+            self.assertEqual(image.size, (800, 600))
@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands.import_content import Command
+from ..models import AuthorStats, Comment, Follow, Group, Post, TimelineEntry
+from ..search import SearchResults
+
+User = get_user_model()
+
+RECORDS = [
+    {
+        "type": "post",
+        "id": "p1",
+        "author": "Archivist",
+        "text": "Старый пост про маяки",
+        "group": "history",
+        "created": "2015-03-01T10:00:00+00:00",
+    },
+    {"type": "post", "id": "p2", "author": "Archivist", "text": "Второй"},
+    {
+        "type": "comment",
+        "id": "c1",
+        "post": "p1",
+        "author": "Reader",
+        "text": "Спасибо",
+    },
+    {"type": "follow", "user": "Reader", "author": "Archivist"},
+]
+
+
+class ImportContentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(
+            title="История", slug="history", description="Описание"
+        )
+        cls.reader = User.objects.create_user(username="Reader")
+
+    def run_import(self, lines, suffix=".ndjson", **options):
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=suffix, delete=False, encoding="utf-8"
+        ) as source:
+            source.write("\n".join(lines) + "\n")
+        self.addCleanup(os.unlink, source.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            "import_content",
+            source.name,
+            stdout=stdout,
+            stderr=stderr,
+            **options,
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_creates_content_and_side_effects(self):
+        """Импорт создает записи и то, что обычно делают сигналы."""
+        self.run_import(map(json.dumps, RECORDS), batch_size=2)
+        author = User.objects.get(username="Archivist")
+        old = Post.objects.get(source_id="p1")
+        self.assertEqual(old.author, author)
+        self.assertEqual(old.group, self.group)
+        self.assertEqual(
+            old.created, datetime(2015, 3, 1, 10, tzinfo=timezone.utc)
+        )
+        self.assertFalse(author.has_usable_password())
+        self.assertEqual(old.comments.get().source_id, "c1")
+        self.assertEqual(Post.objects.get(pk=old.pk).comments_count, 1)
+        stats = AuthorStats.objects.get(user=author)
+        self.assertEqual((stats.posts_count, stats.followers_count), (2, 1))
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertEqual(SearchResults(Post, "маяки").ids(), [old.pk])
+
+    def test_only_imported_authors_are_recounted(self):
+        """Счетчики авторов, не затронутых импортом, не пересчитываются."""
+        bystander = User.objects.create_user(username="Bystander")
+        AuthorStats.objects.create(user=bystander, posts_count=42)
+        self.run_import(map(json.dumps, RECORDS))
+        self.assertEqual(
+            AuthorStats.objects.get(user=bystander).posts_count, 42
+        )
+        self.assertFalse(AuthorStats.objects.filter(user=self.reader).exists())
+
+    def test_rerun_after_crash_processes_written_rows(self):
+        """Повтор после сбоя обрабатывает строки, записанные до него."""
+        lines = list(map(json.dumps, RECORDS))
+        with mock.patch.object(
+            Command, "after_import", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.run_import(lines)
+        self.assertFalse(TimelineEntry.objects.exists())
+        stdout, _ = self.run_import(lines)
+        self.assertIn("Добавлено постов: 0", stdout)
+        author = User.objects.get(username="Archivist")
+        stats = AuthorStats.objects.get(user=author)
+        self.assertEqual((stats.posts_count, stats.followers_count), (2, 1))
+        self.assertEqual(Post.objects.get(source_id="p1").comments_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertEqual(
+            SearchResults(Post, "маяки").ids(),
+            [Post.objects.get(source_id="p1").pk],
+        )
+
+    def test_repeated_import_does_not_duplicate(self):
+        """Повторный импорт того же файла ничего не добавляет."""
+        lines = list(map(json.dumps, RECORDS))
+        self.run_import(lines)
+        stdout, _ = self.run_import(lines)
+        self.assertIn("Добавлено постов: 0, комментариев: 0", stdout)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_csv_and_invalid_records(self):
+        """CSV читается по заголовку, ошибочные записи пропускаются."""
+        _, stderr = self.run_import(
+            [
+                "type,id,author,text,group,post",
+                "post,p1,Archivist,Пост из CSV,,",
+                "post,p2,Archivist,Чужая группа,unknown,",
+                "comment,c1,Reader,Нет поста,,p404",
+                "like,,,,,",
+            ],
+            suffix=".csv",
+        )
+        self.assertEqual(
+            list(Post.objects.values_list("source_id", flat=True)), ["p1"]
+        )
+        self.assertFalse(Comment.objects.exists())
+        self.assertIn("нет группы unknown", stderr)
+        self.assertIn("нет поста p404", stderr)
+        self.assertIn("неизвестный тип like", stderr)
+
+    def test_impossible_date_skips_record(self):
+        """Несуществующая дата пропускает запись, а не прерывает импорт."""
+        broken = dict(RECORDS[0], created="2020-13-45T00:00:00")
+        _, stderr = self.run_import(map(json.dumps, [broken, RECORDS[1]]))
+        self.assertIn("неверная дата 2020-13-45T00:00:00", stderr)
+        self.assertEqual(
+            list(Post.objects.values_list("source_id", flat=True)), ["p2"]
+        )
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import live
+from ..feed_cache import bump_feed_generation
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+def events(response):
+    """События из потока SSE, который закрылся по LIVE_STREAM_TIMEOUT."""
+    body = b"".join(response.streaming_content).decode()
+    return [
+        json.loads(line.split(" ", 1)[1])
+        for line in body.splitlines()
+        if line.startswith("data: ")
+    ]
+
+
+@override_settings(LIVE_FEED=True, LIVE_STREAM_TIMEOUT=0)
+class LiveFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="Author")
+        cls.other = User.objects.create_user(username="Other")
+        cls.reader = User.objects.create_user(username="Reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="live", description="Описание"
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                text="В группе", author=cls.author, group=cls.group
+            ),
+            Post.objects.create(text="Без группы", author=cls.other),
+        ]
+
+    def setUp(self):
+        self.broadcaster = live.Broadcaster(10)
+        patcher = mock.patch.object(live, "broadcaster", self.broadcaster)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for post in self.posts:
+            live.publish_post(post)
+
+    def test_broadcaster_keeps_new_events_once(self):
+        """Повторная публикация поста не дает второго события."""
+        live.publish_post(self.posts[0])
+        seq, backlog = self.broadcaster.backlog(self.posts[0].pk)
+        self.assertEqual(
+            [event["id"] for event in backlog], [self.posts[1].pk]
+        )
+        self.assertEqual(self.broadcaster.wait(seq, 0), (seq, []))
+
+    def test_streams_filter_events(self):
+        """Общая лента, группа и подписки получают свои события."""
+        self.client.force_login(self.reader)
+        for name, args, expected in (
+            ("posts:live_index", [], self.posts),
+            ("posts:live_group", [self.group.slug], self.posts[:1]),
+            ("posts:live_follow", [], self.posts[:1]),
+        ):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse(name, args=args), HTTP_LAST_EVENT_ID="0"
+                )
+                self.assertEqual(response["Content-Type"], "text/event-stream")
+                self.assertEqual(
+                    [event["id"] for event in events(response)],
+                    [post.pk for post in expected],
+                )
+
+    def test_stream_starts_after_given_post(self):
+        """Без Last-Event-ID поток начинается после `after`."""
+        address = reverse("posts:live_index")
+        response = self.client.get(address, {"after": self.posts[0].pk})
+        self.assertEqual(
+            [event["id"] for event in events(response)], [self.posts[1].pk]
+        )
+
+    def test_stream_starts_after_newest_post(self):
+        """Без `after` поток отдает только посты новее уже известных."""
+        response = self.client.get(reverse("posts:live_index"))
+        self.assertEqual(events(response), [])
+
+    def test_card_renders_post(self):
+        """По ссылке из события отдается карточка поста."""
+        (event,) = self.broadcaster.backlog(self.posts[0].pk)[1]
+        response = self.client.get(event["card"])
+        self.assertContains(response, "Без группы")
+        self.assertTemplateUsed(response, "includes/post_card.html")
+
+    def test_catch_up_finds_posts_from_other_processes(self):
+        """Пост без сигнала в этом процессе находится по поколению."""
+        self.broadcaster.catch_up()
+        Post.objects.bulk_create(
+            [Post(text="Из другого воркера", author=self.other)]
+        )
+        post = Post.objects.latest("pk")
+        bump_feed_generation()
+        seq = self.broadcaster.seq
+        self.broadcaster.catch_up()
+        self.assertEqual(
+            [event["id"] for event in self.broadcaster.since(seq)[1]],
+            [post.pk],
+        )
+
+    def test_catch_up_finds_lower_pk_from_other_process(self):
+        """Пост другого воркера с pk меньше локального не теряется."""
+        self.broadcaster.catch_up()
+        # В TestCase нет коммита, и сигнал пост не публикует.
+        remote = Post.objects.create(
+            text="Из другого воркера", author=self.other
+        )
+        local = Post.objects.create(
+            text="Из этого воркера", author=self.author
+        )
+        live.publish_post(local)
+        bump_feed_generation()
+        seq = self.broadcaster.seq
+        self.broadcaster.catch_up()
+        self.assertEqual(
+            [event["id"] for event in self.broadcaster.since(seq)[1]],
+            [remote.pk],
+        )
+
+    @override_settings(LIVE_STREAM_TIMEOUT=60, LIVE_HEARTBEAT=0)
+    def test_stream_catches_up_between_local_events(self):
+        """Поток добирает чужие посты, даже когда идут свои."""
+        self.broadcaster.catch_up()
+        stream = live.stream(live.Subscription(), self.posts[-1].pk)
+        next(stream)
+        remote = Post.objects.create(
+            text="Из другого воркера", author=self.other
+        )
+        local = Post.objects.create(
+            text="Из этого воркера", author=self.author
+        )
+        live.publish_post(local)
+        bump_feed_generation()
+        frames = []
+        for chunk in stream:
+            if chunk.startswith(":"):
+                break
+            frames.append(chunk)
+        self.assertEqual(
+            frames,
+            [live.frame(live.post_event(post)) for post in (local, remote)],
+        )
+
+    @override_settings(
+        LIVE_STREAM_TIMEOUT=60, LIVE_HEARTBEAT=10, LIVE_POLL_INTERVAL=0
+    )
+    def test_stream_catches_up_before_heartbeat(self):
+        """Чужой пост приходит через LIVE_POLL_INTERVAL, а не с пингом."""
+        self.broadcaster.catch_up()
+        stream = live.stream(live.Subscription(), self.posts[-1].pk)
+        next(stream)
+        remote = Post.objects.create(
+            text="Из другого воркера", author=self.other
+        )
+        bump_feed_generation()
+        started = time.monotonic()
+        self.assertEqual(next(stream), live.frame(live.post_event(remote)))
+        self.assertLess(time.monotonic() - started, 5)
+
+    @override_settings(LIVE_FEED=False)
+    def test_live_feed_is_off_by_default(self):
+        """Без LIVE_FEED ленты не открывают поток, а адреса отвечают 404."""
+        response = self.client.get(reverse("posts:index"))
+        self.assertNotContains(response, "EventSource")
+        response = self.client.get(reverse("posts:live_index"))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(LIVE_FEED=True, LIVE_STREAM_TIMEOUT=0)
+class LiveFeedAsgiTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="Author")
+        self.broadcaster = live.Broadcaster(10)
+        patcher = mock.patch.object(live, "broadcaster", self.broadcaster)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self, path, query=b""):
+        from yatube.asgi import application
+
+        messages = [{"type": "http.request", "body": b""}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": query,
+            "headers": [(b"host", b"testserver")],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 5000),
+        }
+        asyncio.run(application(scope, receive, send))
+        body = b"".join(message.get("body", b"") for message in sent[1:])
+        return sent[0]["status"], body.decode()
+
+    def test_new_post_reaches_asgi_stream(self):
+        """Пост после коммита публикуется и уходит в поток под ASGI."""
+        post = Post.objects.create(text="Живой пост", author=self.author)
+        status, body = self.call(reverse("posts:live_index"), b"after=0")
+        self.assertEqual(status, 200)
+        self.assertIn(f"id: {post.pk}\nevent: post\n", body)
+        status, body = self.call(reverse("posts:index"))
+        self.assertEqual(status, 200)
+        self.assertIn("Живой пост", body)
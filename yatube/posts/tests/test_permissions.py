@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class ObjectPermissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="Owner")
+        cls.stranger = User.objects.create_user(username="Stranger")
+        cls.post = Post.objects.create(text="Пост", author=cls.author)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.stranger_client = Client()
+        self.stranger_client.force_login(self.stranger)
+
+    def test_missing_post_returns_404(self):
+        """Правка и комментарий к несуществующему посту — 404."""
+        for name, client in (
+            ("posts:post_edit", self.author_client),
+            ("posts:add_comment", self.stranger_client),
+        ):
+            with self.subTest(name=name):
+                response = client.post(reverse(name, args=[self.post.pk + 1]))
+                self.assertEqual(response.status_code, 404)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_not_author_is_redirected_to_post(self):
+        """Не автора отправляют на страницу поста, пост не меняется."""
+        address = reverse("posts:post_edit", args=[self.post.pk])
+        response = self.stranger_client.post(address, {"text": "Чужой"})
+        self.assertRedirects(
+            response, reverse("posts:post_detail", args=[self.post.pk])
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, "Пост")
+
+    def test_post_is_loaded_once(self):
+        """Пост для проверки прав и для формы читается одним запросом."""
+        address = reverse("posts:post_edit", args=[self.post.pk])
+        self.author_client.get(address)
+        # Сессия, пользователь, пост и список групп для формы.
+        with self.assertNumQueries(4):
+            response = self.author_client.get(address)
+        self.assertEqual(response.context["post"], self.post)
@@ -0,0 +1,34 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..management.commands.check_query_plans import explain, plan_problems
+
+User = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы всех лент идут по индексам без временной сортировки."""
+        call_command("check_query_plans", stdout=StringIO())
+
+    def test_rolled_back_posts_stay_out_of_cache(self):
+        """Фрагменты с откаченными постами не попадают в общий кэш."""
+        call_command("check_query_plans", stdout=StringIO())
+        self.client.force_login(User.objects.create_user(username="reader"))
+        response = self.client.get(reverse("posts:index"))
+        self.assertNotContains(response, "explain")
+
+    def test_full_scan_and_temp_sort_are_reported(self):
+        """Полный проход и сортировка во временном B-дереве замечаются."""
+        plan = explain(
+            "SELECT id FROM posts_post WHERE text = 'x' ORDER BY image"
+        )
+        self.assertEqual(len(plan_problems(plan)), 2)
@@ -0,0 +1,98 @@
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..search import SearchResults, build_query
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="Searcher")
+        self.bread = Post.objects.create(
+            text="Рецепт ржаного хлеба на закваске", author=self.user
+        )
+        self.cake = Post.objects.create(
+            text="Торт без муки и без хлеба", author=self.user
+        )
+        self.comment = Comment.objects.create(
+            text="Закваска живет в холодильнике",
+            author=self.user,
+            post=self.cake,
+        )
+
+    def found(self, text, model=Post):
+        return SearchResults(model, text).ids()
+
+    def test_search_finds_by_words_and_prefixes(self):
+        """Поиск находит посты по словам и их началу."""
+        self.assertEqual(self.found("ржаного"), [self.bread.pk])
+        self.assertEqual(self.found("заквас"), [self.bread.pk])
+        self.assertCountEqual(
+            self.found("хлеба"), [self.bread.pk, self.cake.pk]
+        )
+        self.assertEqual(self.found("закваска", Comment), [self.comment.pk])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        self.bread.text = "Бородинский"
+        self.bread.save()
+        self.assertEqual(self.found("ржаного"), [])
+        self.assertEqual(self.found("бородинский"), [self.bread.pk])
+        self.cake.delete()
+        self.assertEqual(self.found("торт"), [])
+        self.assertEqual(self.found("холодильнике", Comment), [])
+
+    def test_user_input_is_not_parsed_as_fts_syntax(self):
+        """Спецсимволы FTS5 во вводе не ломают запрос."""
+        self.assertEqual(
+            build_query('хлеб" OR NEAR(*'), '"хлеб"* "OR"* "NEAR"*'
+        )
+        self.assertEqual(self.found('"(*^'), [])
+
+    def test_search_view_paginates_results(self):
+        """Страница поиска отдает найденные посты."""
+        # Подсчет, ключи страницы и сами посты; таблица целиком не читается.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("posts:search"), {"q": "хлеба"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["page_obj"].paginator.count, 2)
+        self.assertContains(response, self.bread.text)
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_ranking_is_limited_to_newest_matches(self):
+        """Ранжируются только SEARCH_MAX_RESULTS новейших совпадений."""
+        results = SearchResults(Post, "хлеба")
+        self.assertEqual(results.count(), 1)
+        self.assertEqual(results.ids(), [self.cake.pk])
+
+    def test_admin_uses_search_index(self):
+        """Поиск в админке постов и комментариев идет через индекс."""
+        request = RequestFactory().get("/admin/")
+        for model, expected in (
+            (Post, [self.bread.pk]),
+            (Comment, [self.comment.pk]),
+        ):
+            with self.subTest(model=model):
+                admin_model = site._registry[model]
+                queryset, distinct = admin_model.get_search_results(
+                    request, model.objects.all(), "закваск"
+                )
+                self.assertEqual(
+                    list(queryset.values_list("pk", flat=True)), expected
+                )
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_admin_finds_matches_beyond_search_limit(self):
+        """Админка находит и старые совпадения сверх SEARCH_MAX_RESULTS."""
+        request = RequestFactory().get("/admin/")
+        queryset, _ = site._registry[Post].get_search_results(
+            request, Post.objects.all(), "хлеба"
+        )
+        self.assertCountEqual(
+            queryset.values_list("pk", flat=True),
+            [self.bread.pk, self.cake.pk],
+        )
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class StatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="Counted")
+        cls.reader = User.objects.create_user(username="Counter")
+
+    def stats(self):
+        return AuthorStats.objects.get(user=self.author)
+
+    def test_posts_count_follows_creates_and_deletes(self):
+        """Счетчик постов автора меняется при создании и удалении."""
+        post = Post.objects.create(text="Пост", author=self.author)
+        Post.objects.create(text="Еще пост", author=self.author)
+        self.assertEqual(self.stats().posts_count, 2)
+        post.delete()
+        self.assertEqual(self.stats().posts_count, 1)
+
+    def test_comments_count_follows_creates_and_deletes(self):
+        """Счетчик комментариев поста меняется при создании и удалении."""
+        post = Post.objects.create(text="Пост", author=self.author)
+        comment = Comment.objects.create(
+            text="Комментарий", author=self.reader, post=post
+        )
+        Comment.objects.create(text="Еще", author=self.reader, post=post)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_followers_count_follows_subscriptions(self):
+        """Счетчик подписчиков меняется при подписке и отписке."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats().followers_count, 1)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertEqual(self.stats().followers_count, 0)
+
+    def test_recount_stats_repairs_drift(self):
+        """Команда recount_stats исправляет разошедшиеся счетчики."""
+        post = Post.objects.create(text="Пост", author=self.author)
+        Comment.objects.create(text="Комм", author=self.reader, post=post)
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.update(posts_count=7, followers_count=7)
+        AuthorStats.objects.filter(user=self.reader).delete()
+        Post.objects.update(comments_count=7)
+        call_command("recount_stats", stdout=StringIO())
+        stats = self.stats()
+        post.refresh_from_db()
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count, post.comments_count),
+            (1, 1, 1),
+        )
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.reader).posts_count, 0
+        )
+
+    def test_profile_and_post_detail_use_counters(self):
+        """Страницы профиля и поста берут числа из счетчиков."""
+        post = Post.objects.create(text="Пост", author=self.author)
+        AuthorStats.objects.update(posts_count=42, followers_count=5)
+        response = self.client.get(f"/profile/{self.author.username}/")
+        self.assertEqual(response.context["posts_count"], 42)
+        self.assertEqual(response.context["followers_count"], 5)
+        response = self.client.get(f"/posts/{post.pk}/")
+        self.assertEqual(response.context["count_posts"], 42)
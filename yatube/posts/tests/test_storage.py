@@ -0,0 +1,142 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from ..models import Post, StoredImage
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
+
+
+# Файлы освобождаются в on_commit, поэтому нужны настоящие коммиты.
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="Uploader")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name="meme.gif", content=SMALL_GIF):
+        return Post.objects.create(
+            text="Мем",
+            author=self.user,
+            image=SimpleUploadedFile(name, content),
+        )
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые загрузки делят один файл со счетчиком ссылок."""
+        first = self.create_post("meme.gif")
+        second = self.create_post("copy.GIF")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r"^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$"
+        )
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(
+            os.listdir(directory), [os.path.basename(first.image.path)]
+        )
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).refs, 2
+        )
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл удаляется вместе с последней ссылкой на него."""
+        first = self.create_post()
+        second = self.create_post()
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_replaced_image_is_released(self):
+        """Замена картинки снимает ссылку со старого файла."""
+        post = self.create_post()
+        old_path = post.image.path
+        post = Post.objects.get(pk=post.pk)
+        post.image = SimpleUploadedFile("new.gif", SMALL_GIF + b"\x00")
+        post.save()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_same_file_uploaded_again_keeps_one_reference(self):
+        """Повторная загрузка того же файла в пост не добавляет ссылку."""
+        post = self.create_post()
+        post = Post.objects.get(pk=post.pk)
+        post.image = SimpleUploadedFile("again.gif", SMALL_GIF)
+        post.save()
+        self.assertEqual(StoredImage.objects.get(name=post.image.name).refs, 1)
+        path = post.image.path
+        post.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_post_with_stored_name_takes_reference(self):
+        """Пост с именем уже известного файла держит свою ссылку."""
+        first = self.create_post()
+        second = Post.objects.create(
+            text="Копия", author=self.user, image=first.image.name
+        )
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).refs, 2
+        )
+        second.delete()
+        self.assertTrue(os.path.exists(first.image.path))
+        first.delete()
+        self.assertFalse(os.path.exists(first.image.path))
+
+    def test_imported_posts_take_references(self):
+        """Импорт постов с известной картинкой берет ссылки на нее."""
+        post = self.create_post()
+        source = os.path.join(TEMP_MEDIA_ROOT, "import.ndjson")
+        with open(source, "w", encoding="utf-8") as output:
+            output.write(
+                json.dumps(
+                    {
+                        "type": "post",
+                        "id": "1",
+                        "author": "Importer",
+                        "text": "Из экспорта",
+                        "image": post.image.name,
+                    }
+                )
+            )
+        call_command("import_content", source, stdout=io.StringIO())
+        self.assertEqual(StoredImage.objects.get(name=post.image.name).refs, 2)
+        # Повтор того же файла ссылок не добавляет.
+        call_command("import_content", source, stdout=io.StringIO())
+        self.assertEqual(StoredImage.objects.get(name=post.image.name).refs, 2)
+        post.delete()
+        self.assertTrue(
+            os.path.exists(Post.objects.get(source_id="1").image.path)
+        )
+
+    def test_unknown_files_are_never_deleted(self):
+        """Файлы без счетчика (загруженные раньше) не удаляются."""
+        legacy = os.path.join(TEMP_MEDIA_ROOT, "posts", "legacy.gif")
+        os.makedirs(os.path.dirname(legacy), exist_ok=True)
+        with open(legacy, "wb") as output:
+            output.write(SMALL_GIF)
+        Post.objects.create(
+            text="Старый", author=self.user, image="posts/legacy.gif"
+        ).delete()
+        self.assertTrue(os.path.exists(legacy))
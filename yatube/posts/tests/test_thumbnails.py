@@ -0,0 +1,114 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from ..models import Post, ThumbnailJob
+from ..thumbnails import stored_variants
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="Photographer")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Картинки с одинаковым содержимым получают одно имя, а записи
+        # о миниатюрах sorl кеширует мимо транзакции теста.
+        cache.clear()
+        self.post = Post.objects.create(
+            text="Пост с картинкой",
+            author=self.user,
+            image=SimpleUploadedFile(
+                name="thumb.gif", content=SMALL_GIF, content_type="image/gif"
+            ),
+        )
+
+    def test_upload_enqueues_job(self):
+        """Загрузка картинки ставит задание в очередь один раз."""
+        self.post.save()
+        self.assertEqual(
+            list(ThumbnailJob.objects.values_list("image", flat=True)),
+            [self.post.image.name],
+        )
+
+    def test_page_shows_original_until_worker_runs(self):
+        """Страница не делает миниатюру сама, а показывает оригинал."""
+        address = reverse("posts:post_detail", args=(self.post.pk,))
+        response = self.client.get(address)
+        self.assertContains(response, self.post.image.url)
+        self.assertNotContains(response, "srcset")
+
+    def test_worker_generates_every_size(self):
+        """Воркер нарезает миниатюры и удаляет задание."""
+        call_command("thumbnail_worker", "--once", stdout=StringIO())
+        self.assertFalse(ThumbnailJob.objects.exists())
+        self.post.refresh_from_db()
+        for size in settings.POST_THUMBNAILS:
+            with self.subTest(size=size):
+                self.assertTrue(stored_variants(self.post, size))
+        address = reverse("posts:post_detail", args=(self.post.pk,))
+        (variant, *_), *_ = stored_variants(self.post, "card").values()
+        self.assertContains(self.client.get(address), variant["url"])
+
+    @override_settings(POST_THUMBNAIL_FORMATS=("JPEG",))
+    def test_page_lists_variants_without_kvstore(self):
+        """Лента берет srcset из поста, не заглядывая в key-value store."""
+        call_command("thumbnail_worker", "--once", stdout=StringIO())
+        self.post.refresh_from_db()
+        variants = stored_variants(self.post, "card")["JPEG"]
+        self.assertEqual(
+            [(variant["width"], variant["height"]) for variant in variants],
+            [(480, 170), (960, 339), (1440, 508)],
+        )
+        with mock.patch.object(default.kvstore, "get") as kvstore_get:
+            response = self.client.get(reverse("posts:index"))
+        kvstore_get.assert_not_called()
+        self.assertContains(
+            response,
+            ", ".join(
+                f"{variant['url']} {variant['width']}w" for variant in variants
+            ),
+        )
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'width="1440" height="508"')
+
+    def test_replaced_image_ignores_stale_thumbnails(self):
+        """Пока воркер не дошел до новой картинки, показывается она сама."""
+        call_command("thumbnail_worker", "--once", stdout=StringIO())
+        self.post.refresh_from_db()
+        self.post.image = "posts/other.gif"
+        self.assertEqual(stored_variants(self.post, "card"), {})
+
+    def test_missing_file_drops_job(self):
+        """Задание на удаленную картинку просто снимается."""
+        self.post.image.storage.delete(self.post.image.name)
+        call_command("thumbnail_worker", "--once", stdout=StringIO())
+        self.assertFalse(ThumbnailJob.objects.exists())
@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username="Reader")
+        cls.author = User.objects.create_user(username="Writer")
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def feed(self):
+        response = self.reader_client.get(reverse("posts:follow_index"))
+        return [post.pk for post in response.context["page_obj"]]
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост сразу попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text="Новый пост", author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.feed(), [post.pk])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые посты автора, отписка их убирает."""
+        posts = [
+            Post.objects.create(text=f"Пост {i}", author=self.author)
+            for i in range(3)
+        ]
+        self.reader_client.get(
+            reverse(
+                "posts:profile_follow",
+                kwargs={"username": self.author.username},
+            )
+        )
+        self.assertEqual(self.feed(), [post.pk for post in reversed(posts)])
+        self.reader_client.get(
+            reverse(
+                "posts:profile_unfollow",
+                kwargs={"username": self.author.username},
+            )
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярного автора не разносятся, а подмешиваются
+        в ленту при чтении в правильном порядке."""
+        star = User.objects.create_user(username="Star")
+        fan = User.objects.create_user(username="Fan")
+        Follow.objects.create(user=fan, author=star)
+        Follow.objects.create(user=self.reader, author=star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        expected = []
+        for i in range(12):
+            post = Post.objects.create(
+                text=f"Пост {i}", author=star if i % 2 else self.author
+            )
+            expected.insert(0, post.pk)
+        self.assertFalse(TimelineEntry.objects.filter(post__author=star))
+        first = self.reader_client.get(reverse("posts:follow_index"))
+        page_obj = first.context["page_obj"]
+        second = self.reader_client.get(
+            reverse("posts:follow_index"), {"after": page_obj.next_cursor}
+        )
+        seen = [post.pk for post in page_obj] + [
+            post.pk for post in second.context["page_obj"]
+        ]
+        self.assertEqual(seen, expected)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_posts_stay_when_author_drops_below_limit(self):
+        """Посты, написанные «тяжелым» автором, не пропадают из лент,
+        когда подписчиков у него становится меньше порога."""
+        fan = User.objects.create_user(username="Fan")
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text="Пост звезды", author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        Follow.objects.get(user=fan).delete()
+        self.assertEqual(self.feed(), [post.pk])
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=2)
+    def test_follow_backfills_only_recent_posts(self):
+        """Подписка копирует в ленту только последние посты автора."""
+        posts = [
+            Post.objects.create(text=f"Пост {i}", author=self.author)
+            for i in range(3)
+        ]
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed(), [posts[2].pk, posts[1].pk])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, TIMELINE_BACKFILL_LIMIT=1)
+    def test_drop_below_limit_backfills_only_recent_posts(self):
+        """Автору ниже порога разносятся только последние посты."""
+        fan = User.objects.create_user(username="Fan")
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(text=f"Пост {i}", author=self.author)
+            for i in range(2)
+        ]
+        Follow.objects.get(user=fan).delete()
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(user=self.reader).values_list(
+                    "post", flat=True
+                )
+            ),
+            [posts[1].pk],
+        )
@@ -1,3 +1,4 @@
+import asyncio
 import shutil
 import tempfile
 import time
@@ -7,10 +8,15 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import connection, transaction
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post
+from ..feed_cache import GENERATION_KEY, generation
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -154,18 +160,18 @@ class PostPagesTests(TestCase):
                 response = self.authorized_client.get(reverse_name + "?page=2")
                 self.assertEqual(len(response.context["page_obj"]), 3)
 
-    def test_cache(self):
-        """Страница сохраняет данные в кэш."""
-        first_response = self.authorized_client.get(reverse("posts:index"))
-        self.assertEqual(len(first_response.context["page_obj"]), 1)
-        Post.objects.filter(id=1).delete()
-        second_response = self.authorized_client.get(reverse("posts:index"))
-        self.assertTrue(first_response.content == second_response.content)
-        self.assertEqual(len(second_response.context["page_obj"]), 0)
-        cache.clear()
-        third_response = self.authorized_client.get(reverse("posts:index"))
-        self.assertTrue(first_response.content != third_response.content)
-        self.assertEqual(len(third_response.context["page_obj"]), 0)
+    def test_cache_varies_by_page(self):
+        """Кэш главной страницы не отдает первую страницу вместо второй."""
+        for i in range(2, 14):
+            Post.objects.create(
+                text=f"Тестовый текст № {i}", author=PostPagesTests.user
+            )
+        first_page = self.authorized_client.get(reverse("posts:index"))
+        second_page = self.authorized_client.get(
+            reverse("posts:index"), {"page": 2}
+        )
+        self.assertNotEqual(first_page.content, second_page.content)
+        self.assertContains(second_page, PostPagesTests.post.text)
 
 
 class FollowTests(TestCase):
@@ -237,3 +243,298 @@ class FollowTests(TestCase):
         self.unauthorised_client.force_login(self.user)
         response = self.unauthorised_client.get(reverse("posts:follow_index"))
         self.assertEqual(len(response.context["page_obj"]), 1)
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username="Keyset")
+        cls.group = Group.objects.create(
+            title="Группа для курсоров",
+            slug="cursor-slug",
+            description="Проверка keyset-пагинации",
+        )
+        Post.objects.bulk_create(
+            Post(text=f"Пост № {i}", author=cls.user, group=cls.group)
+            for i in range(25)
+        )
+        cls.expected = list(
+            Post.objects.order_by("-created", "-pk").values_list(
+                "pk", flat=True
+            )
+        )
+
+    def walk(self, address):
+        seen = []
+        response = self.client.get(address)
+        while True:
+            page_obj = response.context["page_obj"]
+            seen.extend(post.pk for post in page_obj)
+            if not page_obj.has_next():
+                return seen
+            response = self.client.get(
+                address, {"after": page_obj.next_cursor}
+            )
+
+    def test_cursor_walk_covers_every_post_once(self):
+        """Переход по курсорам проходит все посты по порядку без повторов."""
+        addresses = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": self.group.slug}),
+            reverse("posts:profile", kwargs={"username": self.user.username}),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                cache.clear()
+                self.assertEqual(self.walk(address), self.expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор `before` возвращает предыдущую страницу."""
+        address = reverse("posts:index")
+        first = self.client.get(address).context["page_obj"]
+        second = self.client.get(
+            address, {"after": first.next_cursor}
+        ).context["page_obj"]
+        back = self.client.get(
+            address, {"before": second.previous_cursor}
+        ).context["page_obj"]
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_cursor_page_runs_no_count_and_no_offset(self):
+        """Страница по курсору не делает COUNT(*) и OFFSET."""
+        address = reverse("posts:index")
+        first = self.client.get(address).context["page_obj"]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(address, {"after": first.next_cursor})
+        for query in queries.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"].upper())
+            self.assertNotIn("OFFSET", query["sql"].upper())
+
+    def test_legacy_page_number_still_works(self):
+        """Старые ссылки `?page=N` открывают ту же страницу."""
+        response = self.client.get(reverse("posts:index"), {"page": 3})
+        page_obj = response.context["page_obj"]
+        self.assertEqual([post.pk for post in page_obj], self.expected[20:])
+        self.assertTrue(page_obj.has_previous())
+        self.assertFalse(page_obj.has_next())
+
+    def test_broken_cursor_opens_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        response = self.client.get(reverse("posts:index"), {"after": "x.y"})
+        page_obj = response.context["page_obj"]
+        self.assertEqual([post.pk for post in page_obj], self.expected[:10])
+
+
+class PostDetailCommentsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="Talker")
+        cls.post = Post.objects.create(
+            text="Популярный пост", author=cls.author
+        )
+        cls.comments = [
+            Comment.objects.create(
+                text=f"Комментарий {i}", author=cls.author, post=cls.post
+            )
+            for i in range(25)
+        ]
+        cls.expected = [comment.pk for comment in reversed(cls.comments)]
+        cls.address = reverse("posts:post_detail", args=[cls.post.pk])
+
+    def test_post_detail_runs_two_queries(self):
+        """Пост с автором, группой и счетчиками — один запрос,
+        страница комментариев — второй."""
+        with self.assertNumQueries(2):
+            response = self.client.get(self.address)
+        self.assertEqual(response.context["count_posts"], 1)
+
+    def test_comments_are_paginated_and_loaded_by_fragment(self):
+        """Комментарии выводятся страницами, дальше — фрагментом."""
+        first = self.client.get(self.address).context["comments"]
+        self.assertEqual([c.pk for c in first], self.expected[:20])
+        response = self.client.get(
+            reverse("posts:post_comments", args=[self.post.pk]),
+            {"after": first.next_cursor},
+        )
+        self.assertTemplateNotUsed(response, "base.html")
+        rest = response.context["comments"]
+        self.assertEqual([c.pk for c in rest], self.expected[20:])
+        self.assertIsNone(rest.next_cursor)
+        self.assertNotContains(response, "Показать еще")
+
+    def test_comments_of_missing_post_give_404(self):
+        """Комментарии несуществующего поста — 404, а не пустой ответ."""
+        response = self.client.get(reverse("posts:post_comments", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+# Поколения лент растут в on_commit, поэтому нужны настоящие коммиты.
+class FeedCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="Cached")
+        self.reader = User.objects.create_user(username="Reader")
+        self.post = Post.objects.create(
+            text="Закэшированный пост", author=self.author
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_cache(self):
+        """Страница сохраняет данные в кэш до изменения постов."""
+        first_response = self.authorized_client.get(reverse("posts:index"))
+        self.assertEqual(len(first_response.context["page_obj"]), 1)
+        Post.objects.filter(id=self.post.pk).update(
+            text="Текст в обход сигналов"
+        )
+        second_response = self.authorized_client.get(reverse("posts:index"))
+        self.assertTrue(first_response.content == second_response.content)
+        Post.objects.get(id=self.post.pk).delete()
+        third_response = self.authorized_client.get(reverse("posts:index"))
+        self.assertTrue(first_response.content != third_response.content)
+        self.assertEqual(len(third_response.context["page_obj"]), 0)
+
+    def test_cached_feed_skips_feed_query(self):
+        """Лента из кэша шаблона не читает посты из базы."""
+        for address in (reverse("posts:index"), reverse("posts:follow_index")):
+            with self.subTest(address=address):
+                self.authorized_client.get(address)
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(address)
+                self.assertFalse(
+                    [
+                        query
+                        for query in queries.captured_queries
+                        if "posts_post" in query["sql"]
+                    ]
+                )
+
+    def test_generation_grows_after_commit(self):
+        """Поколение ленты растет только после коммита нового поста."""
+        before = generation(GENERATION_KEY)
+        with transaction.atomic():
+            Post.objects.create(text="Новый пост", author=self.author)
+            self.assertEqual(generation(GENERATION_KEY), before)
+        self.assertNotEqual(generation(GENERATION_KEY), before)
+
+    def test_follow_refreshes_follow_feed(self):
+        """Подписка сразу меняет закэшированную ленту подписок."""
+        response = self.authorized_client.get(reverse("posts:follow_index"))
+        self.assertNotContains(response, self.post.text)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.authorized_client.get(reverse("posts:follow_index"))
+        self.assertContains(response, self.post.text)
+
+
+# Поколения лент растут в on_commit, поэтому нужны настоящие коммиты.
+class ConditionalFeedTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="Poster")
+        self.reader = User.objects.create_user(username="Visitor")
+        self.group = Group.objects.create(
+            title="Группа", slug="conditional", description="Описание"
+        )
+        Post.objects.create(text="Пост", author=self.author, group=self.group)
+        self.addresses = (
+            reverse("posts:index"),
+            reverse("posts:group_list", args=[self.group.slug]),
+            reverse("posts:profile", args=[self.author.username]),
+        )
+
+    def test_anonymous_feeds_are_public(self):
+        """Анонимам ленты отдаются публичными для обратного прокси."""
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertIn("public", response["Cache-Control"])
+                self.assertIn("s-maxage=", response["Cache-Control"])
+                self.assertIn("Cookie", response["Vary"])
+
+    def test_authenticated_user_gets_304_until_feed_changes(self):
+        """Авторизованный получает 304, пока лента не изменилась."""
+        client = Client()
+        client.force_login(self.reader)
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = client.get(address)
+                self.assertIn("private", response["Cache-Control"])
+                etag = response["ETag"]
+                response = client.get(address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertNotEqual(self.client.get(address)["ETag"], etag)
+        etags = [client.get(address)["ETag"] for address in self.addresses]
+        Post.objects.create(text="Новый", author=self.author, group=self.group)
+        for address, etag in zip(self.addresses, etags):
+            with self.subTest(address=address):
+                response = client.get(address, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет ETag профиля: на нем кнопка и счетчик."""
+        client = Client()
+        client.force_login(self.reader)
+        address = reverse("posts:profile", args=[self.author.username])
+        etag = client.get(address)["ETag"]
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["followers_count"], 1)
+
+
+class AsgiFeedTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="Author")
+        self.group = Group.objects.create(
+            title="Группа", slug="asgi", description="Описание"
+        )
+        self.post = Post.objects.create(
+            text="Пост под ASGI", author=self.author, group=self.group
+        )
+
+    def call(self, path):
+        from yatube.asgi import application
+
+        messages = [{"type": "http.request", "body": b""}]
+        sent = []
+
+        async def receive():
+            return messages.pop()
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "query_string": b"",
+            "headers": [(b"host", b"testserver")],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 5000),
+        }
+        asyncio.run(application(scope, receive, send))
+        body = b"".join(message.get("body", b"") for message in sent[1:])
+        return sent[0]["status"], body.decode()
+
+    def test_parallel_reads_under_asgi(self):
+        """Под ASGI страницы читают базу параллельно в пуле."""
+        for address in (
+            reverse("posts:group_list", args=[self.group.slug]),
+            reverse("posts:profile", args=[self.author.username]),
+            reverse("posts:post_detail", args=[self.post.pk]),
+        ):
+            with self.subTest(address=address):
+                status, body = self.call(address)
+                self.assertEqual(status, 200)
+                self.assertIn("Пост под ASGI", body)
+
+    def test_missing_objects_give_404_under_asgi(self):
+        for address in (
+            reverse("posts:group_list", args=["missing"]),
+            reverse("posts:profile", args=["missing"]),
+            reverse("posts:post_detail", args=[0]),
+        ):
+            with self.subTest(address=address):
+                self.assertEqual(self.call(address)[0], 404)
@@ -0,0 +1,139 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Загрузка картинки ставит ThumbnailJob в очередь в базе, а воркер
+`manage.py thumbnail_worker` нарезает все размеры из POST_THUMBNAILS
+в адаптивных вариантах (POST_THUMBNAIL_WIDTHS × POST_THUMBNAIL_FORMATS).
+Готовые варианты воркер записывает в Post.thumbnails всех постов с этой
+картинкой, так что лента рендерится без обращений к key-value store
+sorl и без Pillow: пока миниатюр нет, показывается оригинал.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .feed_cache import bump_feed_generation
+from .models import Post, ThumbnailJob
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 5
+
+
+def enqueue(image):
+    """Ставит картинку в очередь; повторная постановка ничего не делает."""
+    if image:
+        ThumbnailJob.objects.bulk_create(
+            [ThumbnailJob(image=image.name)], ignore_conflicts=True
+        )
+
+
+def formats():
+    """Форматы вариантов; WEBP — только если Pillow умеет его писать."""
+    return [
+        fmt
+        for fmt in settings.POST_THUMBNAIL_FORMATS
+        if fmt != "WEBP" or features.check("webp")
+    ]
+
+
+def variants(size):
+    """Адаптивные варианты размера: (формат, ширина, геометрия, опции).
+
+    Высота каждого варианта сохраняет пропорции геометрии размера.
+    """
+    geometry, options = settings.POST_THUMBNAILS[size]
+    width, height = map(int, geometry.split("x"))
+    for fmt in formats():
+        for variant_width in settings.POST_THUMBNAIL_WIDTHS:
+            variant_height = round(variant_width * height / width)
+            yield (
+                fmt,
+                variant_width,
+                f"{variant_width}x{variant_height}",
+                {**options, "format": fmt},
+            )
+
+
+def stored_variants(post, size):
+    """Варианты размера из Post.thumbnails: {формат: [вариант, ...]}.
+
+    Вариант — словарь с width, url и height. Описание другой картинки
+    (пост сменил картинку, а воркер еще не дошел) не используется.
+    """
+    if not post.image or not post.thumbnails:
+        return {}
+    stored = json.loads(post.thumbnails)
+    if stored["image"] != post.image.name:
+        return {}
+    return {
+        fmt: [
+            {
+                "width": width,
+                "url": default.storage.url(name),
+                "height": height,
+            }
+            for width, name, height in variants
+        ]
+        for fmt, variants in stored["sizes"].get(size, {}).items()
+    }
+
+
+def generate(name):
+    """Нарезает все размеры и их варианты, возвращает их описание."""
+    # Ключ миниатюры в sorl зависит от хранилища исходника, поэтому
+    # берется то же хранилище, что у поля Post.image.
+    source = ImageFile(name, image_storage)
+    sizes = {}
+    for size in settings.POST_THUMBNAILS:
+        ready = sizes[size] = {}
+        for fmt, width, variant_geometry, variant_options in variants(size):
+            thumbnail = get_thumbnail(
+                source, variant_geometry, **variant_options
+            )
+            ready.setdefault(fmt, []).append(
+                (width, thumbnail.name, thumbnail.height)
+            )
+    return {"image": name, "sizes": sizes}
+
+
+def claim(limit):
+    """Забирает до `limit` свободных заданий, помечая их занятыми."""
+    now = timezone.now()
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    jobs = []
+    pending = ThumbnailJob.objects.filter(free, attempts__lt=MAX_ATTEMPTS)
+    for job in pending[:limit]:
+        taken = ThumbnailJob.objects.filter(
+            free, pk=job.pk, locked_until=job.locked_until
+        ).update(locked_until=now + LEASE)
+        if taken:
+            jobs.append(job)
+    return jobs
+
+
+def process(job):
+    """Выполняет задание; неудачное откладывается с ростом задержки."""
+    try:
+        if image_storage.exists(job.image):
+            stored = json.dumps(generate(job.image))
+            if Post.objects.filter(image=job.image).update(thumbnails=stored):
+                bump_feed_generation()
+    except Exception as error:
+        logger.exception("Не удалось сделать миниатюры %s", job.image)
+        ThumbnailJob.objects.filter(pk=job.pk).update(
+            attempts=F("attempts") + 1,
+            locked_until=timezone.now() + LEASE * (job.attempts + 1),
+            error=str(error),
+        )
+        return False
+    ThumbnailJob.objects.filter(pk=job.pk).delete()
+    return True
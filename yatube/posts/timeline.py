@@ -0,0 +1,183 @@
+"""Лента подписок с разносом постов при записи (fan-out-on-write).
+
+Новый пост автора сразу раскладывается в TimelineEntry его подписчиков,
+и чтение ленты сводится к одному индексному запросу. Посты авторов,
+у которых подписчиков не меньше TIMELINE_FANOUT_LIMIT, не разносятся:
+они подмешиваются к ленте при чтении (fan-out-on-read). Когда автор
+опускается ниже порога, его посты разносятся всем подписчикам, иначе
+написанное за это время пропало бы из их лент.
+
+И новому подписчику, и при таком разносе копируются только последние
+TIMELINE_BACKFILL_LIMIT постов автора: подписка и отписка идут в
+запросе пользователя и не должны копировать всю историю автора.
+"""
+import heapq
+from collections import defaultdict
+
+from core.paginators import CursorPaginator
+from django.conf import settings
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+BATCH_SIZE = 500
+
+
+def is_pulled(author):
+    """Посты автора читаются из ленты напрямую, без разноса."""
+    return AuthorStats.objects.filter(
+        user=author, followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, чьи посты не разносятся."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gte=(
+                settings.TIMELINE_FANOUT_LIMIT
+            ),
+        ).values_list("author", flat=True)
+    )
+
+
+def fan_out_post(post):
+    """Кладет новый пост в ленты всех подписчиков автора."""
+    if is_pulled(post.author):
+        return
+    followers = Follow.objects.filter(author=post.author).values_list(
+        "user", flat=True
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, created=post.created)
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_posts(posts):
+    """Разносит по лентам пачку постов, например после импорта.
+
+    `posts` — итерируемое из кортежей (pk, author_id, created).
+    """
+    posts = list(posts)
+    authors = {author_id for _, author_id, _ in posts}
+    authors -= set(
+        AuthorStats.objects.filter(
+            user__in=authors,
+            followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list("user", flat=True)
+    )
+    followers = defaultdict(list)
+    follows = Follow.objects.filter(author__in=authors).values_list(
+        "author", "user"
+    )
+    for author_id, user_id in follows.iterator():
+        followers[author_id].append(user_id)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, created=created)
+            for pk, author_id, created in posts
+            for user_id in followers[author_id]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user, author):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if is_pulled(author):
+        return
+    _backfill([user.pk], author)
+
+
+def _backfill(user_ids, author):
+    posts = list(
+        Post.objects.filter(author=author)
+        .order_by("-created", "-pk")
+        .values_list("pk", "created")[: settings.TIMELINE_BACKFILL_LIMIT]
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, created=created)
+            for user_id in user_ids
+            for pk, created in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user, author):
+    """Убирает из ленты посты автора, от которого отписались.
+
+    Счетчик подписчиков к этому моменту уже уменьшен. Если автор только
+    что опустился ниже порога, его последние посты разносятся оставшимся.
+    """
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+    dropped_below_limit = AuthorStats.objects.filter(
+        user=author, followers_count=settings.TIMELINE_FANOUT_LIMIT - 1
+    ).exists()
+    if not dropped_below_limit:
+        return
+    followers = Follow.objects.filter(author=author).values_list(
+        "user", flat=True
+    )
+    _backfill(followers.iterator(), author)
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: TimelineEntry плюс посты «тяжелых» авторов.
+
+    Оба источника читаются по индексу до `limit` записей и сливаются
+    по ключу (created, pk), так что страница по-прежнему стоит
+    ограниченное число строк независимо от размера ленты.
+    """
+
+    def __init__(self, user, per_page):
+        entries = TimelineEntry.objects.filter(user=user).select_related(
+            "post__author", "post__group"
+        )
+        super().__init__(entries, per_page, key=("created", "post_id"))
+        self.pulled = None
+        authors = pulled_authors(user)
+        if authors:
+            self.pulled = CursorPaginator(
+                Post.objects.filter(author__in=authors).select_related(
+                    "author", "group"
+                ),
+                per_page,
+            )
+
+    def fetch(self, cursor, backwards, limit, offset=0):
+        posts = [
+            entry.post
+            for entry in super().fetch(cursor, backwards, offset + limit)
+        ]
+        if self.pulled:
+            posts = self._merge(
+                posts,
+                self.pulled.fetch(cursor, backwards, offset + limit),
+                backwards,
+            )
+        return posts[slice(offset, offset + limit)]
+
+    @staticmethod
+    def _merge(materialized, pulled, backwards):
+        merged = heapq.merge(
+            materialized,
+            pulled,
+            key=lambda post: (post.created, post.pk),
+            reverse=not backwards,
+        )
+        seen = set()
+        posts = []
+        for post in merged:
+            if post.pk not in seen:
+                seen.add(post.pk)
+                posts.append(post)
+        return posts
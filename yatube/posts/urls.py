@@ -10,10 +10,20 @@ urlpatterns = [
     path("profile/<str:username>/", views.profile, name="profile"),
     path("posts/<int:post_id>/", views.post_detail, name="post_detail"),
     path("create/", views.post_create, name="post_create"),
+    path(
+        "posts/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments",
+    ),
     path("posts/<int:post_id>/edit/", views.post_edit, name="post_edit"),
     path(
         "posts/<int:post_id>/comment/", views.add_comment, name="add_comment"
     ),
+    path("posts/<int:post_id>/card/", views.post_card, name="post_card"),
+    path("search/", views.search, name="search"),
+    path("live/", views.live_index, name="live_index"),
+    path("group/<slug:slug>/live/", views.live_group, name="live_group"),
+    path("follow/live/", views.live_follow, name="live_follow"),
     path("follow/", views.follow_index, name="follow_index"),
     path(
         "profile/<str:username>/follow/",
@@ -25,4 +35,10 @@ urlpatterns = [
         views.profile_unfollow,
         name="profile_unfollow",
     ),
+    path("group/<slug:slug>/export/", views.export_group, name="export_group"),
+    path(
+        "profile/<str:username>/export/",
+        views.export_profile,
+        name="export_profile",
+    ),
 ]
@@ -0,0 +1,17 @@
+from contextlib import contextmanager
+
+
+@contextmanager
+def keep_created(*models):
+    """Позволяет записать свое значение в поля `created` с auto_now_add.
+
+    Нужно для массовой загрузки: импорта и данных бенчмарка.
+    """
+    fields = [model._meta.get_field("created") for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
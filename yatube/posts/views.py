@@ -1,34 +1,82 @@
 import functools
 
+from core import writes
+from core.asgi import parallel
+from core.paginators import CursorPaginator
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
 
+from yatube.replicas import replica_reads
+
+from . import export, live
+from .feed_cache import (
+    FOLLOWS_GENERATION_KEY, GENERATION_KEY, conditional_feed,
+    feed_cache_context, follow_cache_context, fragment_cached,
+)
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post
+from .permissions import author_required, object_required
+from .search import SearchResults
+from .stats import author_stats
+from .timeline import TimelinePaginator
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+
+def paginate_posts(queryset, request):
+    paginator = CursorPaginator(queryset, POSTS_PER_PAGE)
+    return paginate_feed(paginator, request)
 
 
-def paginate_posts(queryset, page_number):
-    paginator = Paginator(queryset, 10)
-    page_obj = paginator.get_page(page_number)
+def cached_page(fragment, cache_context, paginate, *args):
+    """Страница ленты для фрагмента `{% cache %}` с именем `fragment`.
+
+    Если фрагмент уже в кэше, шаблон страницу не выводит, и она
+    читается из базы, только если к ней обратятся.
+    """
+    if fragment_cached(fragment, cache_context):
+        return SimpleLazyObject(functools.partial(paginate, *args))
+    # Иначе страница все равно нужна шаблону: отдаем обычную Page.
+    return paginate(*args)
+
+
+def paginate_feed(paginator, request):
+    page_obj = paginator.get_page(
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+        number=request.GET.get("page"),
+    )
     return page_obj
 
 
+@conditional_feed(GENERATION_KEY)
+@replica_reads
 def index(request):
     post_list = Post.objects.select_related("author", "group")
-    page_number = request.GET.get("page")
-    page_obj = paginate_posts(post_list, page_number)
-    context = {"page_obj": page_obj}
+    cache_context = feed_cache_context(request)
+    page_obj = cached_page(
+        "index_page", cache_context, paginate_posts, post_list, request
+    )
+    context = {"page_obj": page_obj, **cache_context}
     template = "posts/index.html"
     return render(request, template, context)
 
 
+@conditional_feed(GENERATION_KEY)
+@replica_reads
 def groups_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group).select_related("author")
-    page_number = request.GET.get("page")
-    page_obj = paginate_posts(post_list, page_number)
+    post_list = Post.objects.filter(group__slug=slug).select_related("author")
+    group, page_obj = parallel(
+        request,
+        functools.partial(get_object_or_404, Group, slug=slug),
+        functools.partial(paginate_posts, post_list, request),
+    )
     context = {"group": group, "page_obj": page_obj}
     template = "posts/group_list.html"
     return render(request, template, context)
@@ -37,19 +85,38 @@ def groups_posts(request, slug):
 User = get_user_model()
 
 
+def is_following(user, username):
+    return (
+        user is not None
+        and Follow.objects.filter(
+            user=user, author__username=username
+        ).exists()
+    )
+
+
+@conditional_feed(GENERATION_KEY, FOLLOWS_GENERATION_KEY)
+@replica_reads
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts_count = Post.objects.filter(author=author).count()
-    post_list = Post.objects.filter(author=author).select_related("group")
-    page_number = request.GET.get("page")
-    page_obj = paginate_posts(post_list, page_number)
-    following = (
-        request.user.is_authenticated
-        and Follow.objects.filter(user=request.user, author=author).exists()
+    post_list = Post.objects.filter(author__username=username).select_related(
+        "group"
+    )
+    # Пользователь из сессии читается в потоке запроса, а не в пуле.
+    reader = request.user if request.user.is_authenticated else None
+    author, page_obj, following = parallel(
+        request,
+        functools.partial(
+            get_object_or_404,
+            User.objects.select_related("stats"),
+            username=username,
+        ),
+        functools.partial(paginate_posts, post_list, request),
+        functools.partial(is_following, reader, username),
     )
+    stats = author_stats(author)
     context = {
         "author": author,
-        "posts_count": posts_count,
+        "posts_count": stats.posts_count,
+        "followers_count": stats.followers_count,
         "page_obj": page_obj,
         "following": following,
     }
@@ -57,10 +124,24 @@ def profile(request, username):
     return render(request, template, context)
 
 
-def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    count_posts = Post.objects.filter(author=post.author).count()
+def paginate_comments(post_id, request):
     comments = Comment.objects.filter(post_id=post_id).select_related("author")
+    paginator = CursorPaginator(comments, COMMENTS_PER_PAGE)
+    return paginator.get_page(after=request.GET.get("after"))
+
+
+def post_detail(request, post_id):
+    # Пост, автор, группа и счетчики автора — одним запросом с JOIN.
+    post, comments = parallel(
+        request,
+        functools.partial(
+            get_object_or_404,
+            Post.objects.select_related("author__stats", "group"),
+            id=post_id,
+        ),
+        functools.partial(paginate_comments, post_id, request),
+    )
+    count_posts = author_stats(post.author).posts_count
     form = CommentForm(request.POST or None)
     context = {
         "is_valid": request.user == post.author,
@@ -73,6 +154,27 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@object_required(Post.objects.only("pk"), "post_id")
+def post_comments(request, post_id, post):
+    """Следующая страница комментариев фрагментом для «Показать еще»."""
+    context = {
+        "post_id": post_id,
+        "comments": paginate_comments(post_id, request),
+    }
+    return render(request, "includes/comments.html", context)
+
+
+def search(request):
+    query = request.GET.get("q", "").strip()
+    results = SearchResults(
+        Post, query, Post.objects.select_related("author", "group")
+    )
+    paginator = Paginator(results, POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get("page"))
+    context = {"query": query, "page_obj": page_obj}
+    return render(request, "posts/search.html", context)
+
+
 @login_required
 def post_create(request):
     template = "posts/post_create.html"
@@ -93,23 +195,9 @@ def post_create(request):
     return render(request, template, context)
 
 
-def user_master_required(func):
-    """Декоратор, который проверяет имеет ли право юзер редактировать пост."""
-
-    @functools.wraps(func)
-    def wrapper(request, *args, **kwargs):
-        post = Post.objects.get(id=kwargs["post_id"])
-        if request.user != post.author:
-            return redirect("posts:post_detail", post.pk)
-        return func(request, *args, **kwargs)
-
-    return wrapper
-
-
-@user_master_required
-def post_edit(request, post_id):
+@author_required(Post.objects.all(), "post_id")
+def post_edit(request, post_id, post):
     template = "posts/post_create.html"
-    post = get_object_or_404(Post, id=post_id)
     is_edit = True
     if request.method == "POST":
         form = PostForm(
@@ -134,26 +222,30 @@ def post_edit(request, post_id):
 
 
 @login_required
-def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+@object_required(Post.objects.only("pk"), "post_id")
+def add_comment(request, post_id, post):
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        writes.save(comment)
     return redirect("posts:post_detail", post_id=post_id)
 
 
+def timeline_page(request):
+    paginator = TimelinePaginator(request.user, POSTS_PER_PAGE)
+    return paginate_feed(paginator, request)
+
+
 @login_required
+@replica_reads
 def follow_index(request):
-    authors = Follow.objects.filter(user=request.user).values_list(
-        "author", flat=True
+    cache_context = follow_cache_context(request)
+    page_obj = cached_page(
+        "follow_page", cache_context, timeline_page, request
     )
-    post_list = Post.objects.filter(author__in=authors).select_related("group")
-    page_number = request.GET.get("page")
-    page_obj = paginate_posts(post_list, page_number)
-    context = {"page_obj": page_obj}
+    context = {"page_obj": page_obj, **cache_context}
     return render(request, "posts/follow.html", context)
 
 
@@ -170,3 +262,74 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect("posts:profile", username=username)
+
+
+def export_response(records, filename):
+    response = StreamingHttpResponse(
+        export.ndjson(records), content_type="application/x-ndjson"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def export_group(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    images = bool(request.GET.get("images"))
+    records = export.group_records(group, images=images)
+    return export_response(records, f"group-{group.slug}.ndjson")
+
+
+@login_required
+def export_profile(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        return redirect("posts:profile", username)
+    images = bool(request.GET.get("images"))
+    records = export.user_records(author, images=images)
+    return export_response(records, f"user-{author.username}.ndjson")
+
+
+def live_response(request, subscription):
+    """Поток SSE о новых постах; Last-Event-ID продолжает прерванный."""
+    if not settings.LIVE_FEED:
+        raise Http404("Живая лента выключена.")
+    after = request.META.get("HTTP_LAST_EVENT_ID") or request.GET.get("after")
+    try:
+        after = int(after)
+    except (TypeError, ValueError):
+        after = live.broadcaster.newest_pk()
+    response = StreamingHttpResponse(
+        live.stream(subscription, after), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    # ASGI-обработчик отдает поток асинхронно, не занимая поток сервера.
+    response.async_stream = functools.partial(
+        live.stream_async, subscription, after
+    )
+    return response
+
+
+def live_index(request):
+    return live_response(request, live.Subscription())
+
+
+def live_group(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return live_response(request, live.Subscription(group=group))
+
+
+@login_required
+def live_follow(request):
+    return live_response(request, live.Subscription(user=request.user))
+
+
+def post_card(request, post_id):
+    """Карточка поста для вставки в ленту по событию живой ленты."""
+    # Не с реплики: карточку просят сразу после публикации поста.
+    post = get_object_or_404(
+        Post.objects.select_related("author", "group"), pk=post_id
+    )
+    context = {"post": post, "show_group": "in_group" not in request.GET}
+    return render(request, "includes/post_card.html", context)
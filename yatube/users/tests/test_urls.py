@@ -9,7 +9,6 @@ User = get_user_model()
 
 class UsersURLTests(TestCase):
     def setUp(self):
-        super().setUpClass()
         self.guest_client = Client()
         self.user = User.objects.create_user(
             username="HasNoName",
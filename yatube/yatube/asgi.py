@@ -0,0 +1,15 @@
+"""ASGI-точка входа, например `uvicorn yatube.asgi:application`.
+
+Обработчик — core.asgi.ASGIHandler: Django 2.2 выполняется в пуле
+потоков, а потоки живой ленты (/live/) отдаются асинхронно.
+"""
+import os
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+django.setup(set_prefix=False)
+
+from core.asgi import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
@@ -0,0 +1,116 @@
+"""Чтение лент с реплик, запись — в основную базу.
+
+Реплики перечислены в DATABASE_REPLICAS. Роутер отправляет на случайную
+реплику только чтения внутри view с декоратором `replica_reads`, все
+остальное — в `default`. Запросы вне HTTP (команды, shell) тоже идут в
+`default`.
+
+Реплика отстает от основной базы, поэтому после любой записи
+StickyPrimaryMiddleware ставит cookie, и следующие
+REPLICA_STICKY_SECONDS секунд запросы этого пользователя читают из
+`default`: он сразу видит свой пост или комментарий. Сессии всегда
+читаются из `default`, иначе только что вошедший пользователь мог бы
+не найти свою сессию на реплике.
+"""
+import functools
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PRIMARY = "default"
+PRIMARY_APPS = {"sessions"}
+STICKY_COOKIE = "primary_until"
+
+current_routing = ContextVar("current_routing", default=None)
+
+
+class Routing:
+    """Состояние маршрутизации одного запроса."""
+
+    def __init__(self, sticky):
+        self.sticky = sticky
+        self.replica_reads = False
+        self.wrote = False
+
+
+def replica_reads(view):
+    """Разрешает view читать с реплики, если запрос не прилип к primary."""
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        routing = current_routing.get()
+        if routing is None:
+            return view(request, *args, **kwargs)
+        routing.replica_reads = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            routing.replica_reads = False
+
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Связанные объекты читаются из той же базы, что и исходный.
+            return instance._state.db
+        routing = current_routing.get()
+        if (
+            routing is None
+            or routing.sticky
+            or routing.wrote
+            or not routing.replica_reads
+            or not settings.DATABASE_REPLICAS
+            or model._meta.app_label in PRIMARY_APPS
+        ):
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплики вместе с данными при синхронизации.
+        return db == PRIMARY
+
+
+class StickyPrimaryMiddleware:
+    """Ведет Routing запроса и прилипание к primary после записи."""
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            until = 0
+        routing = Routing(sticky=until > time.time())
+        token = current_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        if routing.wrote:
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(int(time.time()) + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
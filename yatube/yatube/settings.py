@@ -26,14 +26,17 @@ INSTALLED_APPS = [
     "users.apps.UsersConfig",
     "core.apps.CoreConfig",
     "about.apps.AboutConfig",
+    "api.apps.ApiConfig",
     "sorl.thumbnail",
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
+    "yatube.replicas.StickyPrimaryMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
@@ -56,6 +59,7 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
                 "core.context_processors.year.year",
+                "core.context_processors.live_feed.live_feed",
             ],
         },
     },
@@ -63,13 +67,40 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "yatube.wsgi.application"
 
+# yatube.sqlite — SQLite в режиме WAL с PRAGMA из yatube/sqlite/base.py.
+# Соединение живет между запросами DB_CONN_MAX_AGE секунд.
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "yatube.sqlite",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
     }
 }
 
+# Новые посты и комментарии пишет один поток процесса, собирая вставки
+# за WRITE_COALESCING_WINDOW мс в одну транзакцию (core/writes.py).
+WRITE_COALESCING = os.getenv("WRITE_COALESCING", "") == "1"
+WRITE_COALESCING_WINDOW = int(os.getenv("WRITE_COALESCING_WINDOW", 5))
+WRITE_COALESCING_BATCH = 100
+
+# Реплики для чтения лент, см. yatube/replicas.py. DB_REPLICAS=2 добавляет
+# replica1 и replica2 — копии основной базы, которые обновляет
+# `manage.py sync_replicas --interval 5`. В тестах реплики — зеркала
+# основной базы.
+DATABASE_REPLICAS = [
+    f"replica{number}"
+    for number in range(1, int(os.getenv("DB_REPLICAS", 0)) + 1)
+]
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "NAME": os.path.join(BASE_DIR, f"db.{alias}.sqlite3"),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["yatube.replicas.ReplicaRouter"]
+# Сколько секунд после записи пользователь читает из основной базы.
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 10))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -108,5 +139,95 @@ PRACTICUM_TOKEN = os.getenv("PRACTICUM_TOKEN")
 
 CSRF_FAILURE_VIEW = "core.views.csrf_failure"
 
+# Посты авторов с таким числом подписчиков не разносятся по лентам
+# при публикации, а подмешиваются в ленту подписок при чтении.
+TIMELINE_FANOUT_LIMIT = int(os.getenv("TIMELINE_FANOUT_LIMIT", 1000))
+# Сколько последних постов автора копируется в ленту при подписке и
+# когда автор опускается ниже порога разноса.
+TIMELINE_BACKFILL_LIMIT = int(os.getenv("TIMELINE_BACKFILL_LIMIT", 100))
+
+# Кэш процесса (L1) поверх общего для всех воркеров файлового кэша
+# (L2), см. core.cache. Ключи поколений всегда читаются из L2.
+CACHES = {
+    "default": {
+        "BACKEND": "core.cache.TieredCache",
+        "LOCATION": "tiered",
+        "OPTIONS": {
+            "SHARED": "shared",
+            "MAX_ENTRIES": 1000,
+            "LOCAL_TIMEOUT": 30,
+        },
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION", os.path.join(BASE_DIR, "cache")
+        ),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Время жизни HTML-фрагментов лент; свежесть после записи обеспечивает
+# поколение кэша, которое увеличивается при изменении постов.
+FEED_CACHE_TIMEOUT = int(os.getenv("FEED_CACHE_TIMEOUT", 300))
+# Сколько секунд обратный прокси может отдавать анонимам ленту из кэша.
+FEED_PROXY_CACHE_TIMEOUT = int(os.getenv("FEED_PROXY_CACHE_TIMEOUT", 60))
+
+# Живая лента (posts/live.py). Каждый поток держит соединение до
+# LIVE_STREAM_TIMEOUT секунд, а под WSGI еще и поток воркера, поэтому она
+# включается только при запуске под ASGI (yatube/asgi.py): LIVE_FEED=1.
+# Дальше: сколько последних событий помнит процесс, как часто поток
+# проверяет посты других воркеров, как часто шлет пинг и через сколько
+# секунд закрывается, чтобы клиент переподключился.
+LIVE_FEED = os.getenv("LIVE_FEED", "") == "1"
+LIVE_BUFFER_SIZE = 256
+LIVE_POLL_INTERVAL = 2
+LIVE_HEARTBEAT = 15
+LIVE_STREAM_TIMEOUT = int(os.getenv("LIVE_STREAM_TIMEOUT", 300))
+
+# Потоки ASGI-обработчика (core/asgi.py) для синхронного кода Django и
+# отдельный пул, в котором идут параллельные чтения страниц
+# (core.asgi.parallel) и запросы живой ленты. Каждый запрос держит поток
+# ASGI_THREADS до ответа.
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", 16))
+ASGI_SYNC_THREADS = int(os.getenv("ASGI_SYNC_THREADS", 32))
+
+# Поиск ранжирует и считает не больше стольких лучших совпадений.
+SEARCH_MAX_RESULTS = 1000
+
+# Метрики запросов (Server-Timing и лог core.metrics), по умолчанию
+# выключены. Запросы одной формы, повторенные столько раз, — N+1.
+REQUEST_METRICS = os.getenv("REQUEST_METRICS", "") == "1"
+REQUEST_METRICS_REPEATS = 3
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "core.metrics": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+
+# Загруженные картинки постов уменьшаются до этого размера и
+# перекодируются без метаданных (WEBP без поддержки в Pillow — JPEG).
+# Оригиналы можно сохранять в posts/originals/.
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+POST_IMAGE_FORMAT = "WEBP"
+POST_IMAGE_QUALITY = 85
+POST_IMAGE_KEEP_ORIGINALS = False
+
+# Размеры миниатюр картинок постов: имя -> (геометрия, опции sorl).
+# Их нарезает воркер `manage.py thumbnail_worker`.
+POST_THUMBNAILS = {
+    "card": ("960x339", {"crop": "center", "upscale": True}),
+}
+# Для `<picture>`/srcset каждый размер режется еще и этими ширинами
+# в этих форматах; последний формат — запасной для `<img>`.
+POST_THUMBNAIL_WIDTHS = (480, 960, 1440)
+POST_THUMBNAIL_FORMATS = ("WEBP", "JPEG")
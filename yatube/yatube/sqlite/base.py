@@ -0,0 +1,46 @@
+"""SQLite с настройками для сайта: WAL и PRAGMA на каждом соединении.
+
+    DATABASES = {
+        "default": {
+            "ENGINE": "yatube.sqlite",
+            "NAME": ...,
+            "CONN_MAX_AGE": 60,
+            "OPTIONS": {"pragmas": {"cache_size": -64000}},
+        }
+    }
+
+В режиме WAL читатели не ждут писателя и наоборот, поэтому запись
+комментария больше не блокирует чтение лент. `busy_timeout` заставляет
+конкурирующего писателя подождать, а не сразу получить «database is
+locked». `pragmas` из OPTIONS дополняют и переопределяют PRAGMAS,
+остальные OPTIONS уходят в `sqlite3.connect` как обычно. Соединения
+живут между запросами CONN_MAX_AGE секунд, так что PRAGMA выполняются
+один раз на соединение воркера, а не на каждый запрос.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    # В WAL с NORMAL коммит не ждет fsync, но база не портится при
+    # падении процесса; теряются разве что последние коммиты при
+    # отключении питания.
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    # Отрицательное значение — размер в КиБ, на каждое соединение.
+    "cache_size": -20000,
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **kwargs.pop("pragmas", {})}
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn